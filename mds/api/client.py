@@ -75,6 +75,46 @@ class Client():
         """
         return "Accept", f"application/vnd.mds.provider+json;version={version.header}"
 
+    def _prepare(self, record_type, provider=None, **kwargs):
+        """
+        Prepare a request for Provider data from the arguments to get().
+
+        Returns a tuple (provider, params, paging, rate_limit).
+        """
+        config = kwargs.pop("config", self.config)
+        provider = self._provider_or_raise(provider, **config)
+        paging = bool(kwargs.pop("paging", True))
+        rate_limit = int(kwargs.pop("rate_limit", 0))
+        version = Version(kwargs.pop("version", self.version))
+
+        # select the appropriate time range parameter names from record_type and version
+
+        times = {}
+        # the querystring for status_changes and trips < 0.3.0
+        start = kwargs.pop("start_time", None)
+        end = kwargs.pop("end_time", None)
+
+        if record_type == STATUS_CHANGES or version < Version("0.3.0"):
+            times["start_time"] = self._date_format(start)
+            times["end_time"] = self._date_format(end)
+        else:
+            # set to the new querystring arg, but allow use of either new or old
+            times["min_end_time"] = self._date_format(kwargs.pop("min_end_time", start), version=version)
+            times["max_end_time"] = self._date_format(kwargs.pop("max_end_time", end), version=version)
+
+        # combine with leftover kwargs
+        params = {
+            **times,
+            **kwargs
+        }
+
+        if not hasattr(provider, "headers"):
+            setattr(provider, "headers", {})
+
+        provider.headers.update(dict([(self._media_type_version_header(version))]))
+
+        return provider, params, paging, rate_limit
+
     def _provider_or_raise(self, provider, **kwargs):
         """
         Get a Provider instance from the argument, self, or raise an error.
@@ -135,37 +175,7 @@ class Client():
             list
                 The non-empty payloads (e.g. payloads with data records), one for each requested page.
         """
-        config = kwargs.pop("config", self.config)
-        provider = self._provider_or_raise(provider, **config)
-        paging = bool(kwargs.pop("paging", True))
-        rate_limit = int(kwargs.pop("rate_limit", 0))
-        version = Version(kwargs.pop("version", self.version))
-
-        # select the appropriate time range parameter names from record_type and version
-
-        times = {}
-        # the querystring for status_changes and trips < 0.3.0
-        start = kwargs.pop("start_time", None)
-        end = kwargs.pop("end_time", None)
-
-        if record_type == STATUS_CHANGES or version < Version("0.3.0"):
-            times["start_time"] = self._date_format(start)
-            times["end_time"] = self._date_format(end)
-        else:
-            # set to the new querystring arg, but allow use of either new or old
-            times["min_end_time"] = self._date_format(kwargs.pop("min_end_time", start), version=version)
-            times["max_end_time"] = self._date_format(kwargs.pop("max_end_time", end), version=version)
-
-        # combine with leftover kwargs
-        params = {
-            **times,
-            **kwargs
-        }
-
-        if not hasattr(provider, "headers"):
-            setattr(provider, "headers", {})
-
-        provider.headers.update(dict([(self._media_type_version_header(version))]))
+        provider, params, paging, rate_limit = self._prepare(record_type, provider, **kwargs)
 
         # request
         return self._request(provider, record_type, params, paging, rate_limit)
@@ -264,6 +274,32 @@ class Client():
         """
         return self.get(TRIPS, provider, **kwargs)
 
+    def stream(self, record_type, provider=None, **kwargs):
+        """
+        Request Provider data, yielding non-empty payloads as each page is received.
+
+        Unlike get(), only the current page is held in memory, and following pages are not
+        requested until the caller is ready for them.
+
+        Parameters:
+            record_type: str
+                The type of MDS Provider record ("status_changes" or "trips").
+
+            provider: str, UUID, Provider, optional
+                Provider instance or identifier to issue this request to.
+                By default issue the request to this client's Provider instance.
+
+            Additional keyword arguments are the same as for get().
+
+        Return:
+            iterator
+                The non-empty payloads (e.g. payloads with data records), one for each requested page.
+        """
+        provider, params, paging, rate_limit = self._prepare(record_type, provider, **kwargs)
+
+        for payload in self._pages(provider, record_type, params, paging, rate_limit):
+            yield payload
+
     @staticmethod
     def _encoder_or_raise(version):
         """
@@ -281,8 +317,16 @@ class Client():
 
         Returns a list of payloads, with length corresponding to the number of non-empty responses.
         """
+        return list(Client._pages(provider, record_type, params, paging, rate_limit))
+
+    @staticmethod
+    def _pages(provider, record_type, params, paging, rate_limit):
+        """
+        Send one or more requests to a provider's endpoint.
+
+        Yields each non-empty payload as it is received.
+        """
         url = provider.endpoints[record_type]
-        results = []
 
         # establish an authenticated session
         session = Client._session(provider)
@@ -292,11 +336,11 @@ class Client():
 
         if r.status_code is not 200:
             Client._describe(r)
-            return results
+            return
 
         payload = r.json()
         if Client._has_data(payload, record_type):
-            results.append(payload)
+            yield payload
 
         # get subsequent pages of data
         next_url = Client._next_url(payload)
@@ -309,15 +353,13 @@ class Client():
 
             payload = r.json()
             if Client._has_data(payload, record_type):
-                results.append(payload)
+                yield payload
 
             next_url = Client._next_url(payload)
 
             if next_url and rate_limit:
                 time.sleep(rate_limit)
 
-        return results
-
     @staticmethod
     def _session(provider):
         """
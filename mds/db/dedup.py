@@ -0,0 +1,208 @@
+"""
+Client-side deduplication of MDS Provider records across loads.
+"""
+
+import pathlib
+import threading
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+
+from ..db import loaders, schema
+from ..schemas import STATUS_CHANGES, TRIPS
+from ..versions import Version
+
+
+KEY_COLUMNS = {
+    STATUS_CHANGES: schema.PRIMARY_KEYS[STATUS_CHANGES],
+    TRIPS: schema.PRIMARY_KEYS[TRIPS]
+}
+
+UNDATED = "undated"
+
+# (DedupIndex, pending) waiting for a connection's transaction to commit, kept in conn.info
+PENDING_INFO = "mds_dedup_pending"
+
+
+class DedupIndex():
+    """
+    An index of the keys of records that have already been loaded, partitioned by record_type,
+    provider and day, and consulted before staging so that those records can be skipped.
+
+    Each record key (see KEY_COLUMNS) is stored as a 64-bit hash; when a path is given, the hashes
+    for a partition are appended to a compact binary file:
+
+        path/record_type/provider_id/YYYYMMDD.bin
+
+    Partitions are read from disk the first time they are needed, so only the days covered by
+    incoming data are held in memory.
+    """
+
+    def __init__(self, path=None):
+        """
+        Initialize a new DedupIndex.
+
+        Parameters:
+            path: str, Path, optional
+                The directory where the index is persisted. By default, the index is kept in memory only.
+        """
+        self.path = pathlib.Path(path) if path else None
+        self._partitions = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"<mds.db.dedup.DedupIndex ('{self.path}')>"
+
+    def commit(self, pending, connection=None):
+        """
+        Add keys returned by filter() to the index, e.g. once their records have been loaded.
+
+        Parameters:
+            pending: dict
+                (record_type, provider_id, day) partitions and their arrays of new key hashes.
+
+            connection: sqlalchemy.engine.Connection, optional
+                The connection the records were loaded with. When it has a transaction in progress,
+                the keys are added once the transaction commits, and discarded if it rolls back.
+        """
+        if connection is not None and connection.in_transaction():
+            _listen(connection.engine)
+            connection.info.setdefault(PENDING_INFO, []).append((self, pending))
+            return
+
+        with self._lock:
+            for partition, hashes in pending.items():
+                if len(hashes) == 0:
+                    continue
+
+                existing = self._partition(partition)
+                self._partitions[partition] = np.union1d(existing, hashes)
+
+                if self.path:
+                    file = self._file(partition)
+                    file.parent.mkdir(parents=True, exist_ok=True)
+                    with open(file, "ab") as f:
+                        np.asarray(hashes, dtype=np.uint64).tofile(f)
+
+    def filter(self, df, record_type, version=None):
+        """
+        Drop records from df whose keys are already in the index, or repeated within df.
+
+        Parameters:
+            df: pandas.DataFrame
+                The MDS records to check.
+
+            record_type: str
+                The type of MDS data ("status_changes" or "trips").
+
+            version: str, Version, optional
+                The MDS version of the data, used to interpret numeric timestamps.
+                By default, Version.mds_lower().
+
+        Return:
+            tuple (df: pandas.DataFrame, pending: dict)
+                The records not yet in the index, and the keys of those records to commit() after they
+                are loaded.
+        """
+        if record_type not in KEY_COLUMNS:
+            raise ValueError(f"Invalid record_type '{record_type}'.")
+        if len(df) == 0:
+            return df, {}
+
+        version = Version(version or Version.mds_lower())
+        hashes, days = self._keys(df, record_type, version)
+
+        keep = ~hashes.duplicated(keep="last").values
+        pending = {}
+
+        groups = pd.DataFrame({ "provider": df["provider_id"].astype(str).values, "day": days.values })
+        with self._lock:
+            for (provider, day), positions in groups.groupby(["provider", "day"]).indices.items():
+                partition = (record_type, provider, day)
+                group = hashes.values[positions]
+                seen = np.isin(group, self._partition(partition))
+                keep[positions[seen]] = False
+                pending[partition] = np.unique(group[~seen])
+
+        if keep.all():
+            return df, pending
+
+        return df.iloc[keep.nonzero()[0]].copy(), pending
+
+    @classmethod
+    def _keys(cls, df, record_type, version):
+        """
+        Get the Series of uint64 key hashes and the Series of YYYYMMDD days for the records in df.
+        """
+        time_column = schema.TIME_COLUMNS[record_type]
+
+        # normalize timestamps, which may arrive as numbers, text or datetimes
+        times = pd.DataFrame({ time_column: df[time_column] }, index=df.index)
+        times = loaders.DataFrame._timestamps_todatetime(times, [time_column], version)[time_column]
+
+        keys = pd.DataFrame(index=df.index)
+        for col in KEY_COLUMNS[record_type]:
+            if col == time_column:
+                # the same encoding for every row, NaT is the minimum int64
+                keys[col] = times.values.view("int64")
+            else:
+                keys[col] = df[col].astype(str) if col in df else ""
+
+        hashes = pd.util.hash_pandas_object(keys, index=False)
+
+        days = times.dt.strftime("%Y%m%d").fillna(UNDATED)
+
+        return hashes, days
+
+    def _file(self, partition):
+        """
+        Get the path of the file persisting partition.
+        """
+        record_type, provider, day = partition
+        return self.path / record_type / provider / f"{day}.bin"
+
+    def _partition(self, partition):
+        """
+        Get the sorted array of key hashes for partition, reading it from disk as needed.
+        """
+        if partition not in self._partitions:
+            hashes = np.array([], dtype=np.uint64)
+            if self.path and self._file(partition).is_file():
+                hashes = np.unique(np.fromfile(self._file(partition), dtype=np.uint64))
+            self._partitions[partition] = hashes
+
+        return self._partitions[partition]
+
+
+def _listen(engine):
+    """
+    Listen for the transactions of engine's connections ending, to handle keys pending on them.
+    """
+    if not sqlalchemy.event.contains(engine, "commit", _commit_pending):
+        sqlalchemy.event.listen(engine, "commit", _commit_pending)
+        sqlalchemy.event.listen(engine, "rollback", _discard_pending)
+        sqlalchemy.event.listen(engine, "checkin", _discard_checkin)
+
+
+def _commit_pending(conn):
+    """
+    Add the keys pending on conn to their indexes, as its transaction commits.
+    """
+    for index, pending in conn.info.pop(PENDING_INFO, []):
+        index.commit(pending)
+
+
+def _discard_pending(conn):
+    """
+    Discard the keys pending on conn, as its transaction rolls back.
+    """
+    conn.info.pop(PENDING_INFO, None)
+
+
+def _discard_checkin(dbapi_connection, connection_record):
+    """
+    Discard the keys pending on a connection returned to the pool without committing.
+    """
+    if connection_record is not None:
+        connection_record.info.pop(PENDING_INFO, None)
@@ -2,17 +2,32 @@
 Format-specific data loading for MDS Provider database backends.
 """
 
-import string
+import collections.abc
+import contextlib
+import datetime
+import io
+import numbers
+import pathlib
 
 import pandas as pd
 
 from ..db import sql
-from ..fake import util
+from ..encoding import json_dumps
 from ..files import DataFile
 from ..schemas import STATUS_CHANGES, TRIPS
 from ..versions import UnexpectedVersionError, UnsupportedVersionError, Version
 
 
+COUNTS = ["staged", "inserted", "updated", "ignored"]
+METHODS = ["insert", "copy"]
+TIMESTAMPS = ["timestamp", "timestamptz"]
+COPY_NULL = "\\N"
+PREPARED_INFO = "mds_prepared_statements"
+STAGING_INFO = "mds_staging_tables"
+
+_dispatch = {}
+
+
 class DataFrame():
     """
     A data loader for pandas.DataFrame instances.
@@ -28,8 +43,19 @@ class DataFrame():
             Return True if the data loader can load data from source.
 
     See FileLoader for an example implementation.
+
+    can_load() is consulted for every load that doesn't name its loader, so it should be cheap,
+    e.g. by checking types and sampling a few items rather than inspecting all of source.
     """
 
+    _loaders = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # a new loader is available, refresh the cached loaders and dispatch
+        DataFrame._loaders = None
+        _dispatch.clear()
+
     def load(self, source, **kwargs):
         """
         Inserts MDS data from a DataFrame.
@@ -47,24 +73,47 @@ class DataFrame():
             engine: sqlalchemy.engine.Engine
                 The engine used for connections to the database backend.
 
+            batch_size: int, optional
+                The maximum number of rows staged and upserted at a time. When given, every batch
+                is loaded on a single connection, in a single transaction.
+                By default, load all rows at once.
+
             before_load: callable(df=DataFrame, version=Version): DataFrame, optional
                 Callback executed on the incoming DataFrame and Version.
                 Should return the final DataFrame for loading.
 
+            connection: sqlalchemy.engine.Connection, optional
+                An open connection to load with, in its current transaction.
+                By default, a new connection and transaction are started from engine.
+
+            geometry: bool, optional
+                True to stage locations and routes as EWKT and insert them as PostGIS geometry.
+                Only applies when stage_first evaluates True, and requires PostgreSQL.
+                By default, False.
+
+            method: str, optional
+                How rows are written to the database, one of:
+                * insert: INSERT statements issued via DataFrame.to_sql (default)
+                * copy: the fastest bulk load for the engine's dialect: PostgreSQL COPY FROM STDIN,
+                  streamed from an in-memory CSV buffer; or a DuckDB append from the registered
+                  DataFrame. SQLite falls back to insert.
+
             on_conflict_update: tuple (condition: str, actions: list), optional
                 Generate an "ON CONFLICT condition DO UPDATE SET actions" statement.
                 Only applies when stage_first evaluates True.
 
+            prepared: bool, optional
+                True (default) to run the PostgreSQL staging merge as a server-side prepared
+                statement, parsed and planned once per connection. False when connections can't
+                keep session state, e.g. behind a transaction-pooling PgBouncer.
+
             stage_first: bool, int, optional
-                True (default) to stage data in a temp table before upserting to the final table.
+                True (default) to stage data in a TEMP table before upserting to the final table.
                 False to load directly into the target table.
 
-                Given an int greater than 0, determines the degrees of randomness when creating the
-                temp table, e.g.
-
-                    stage_first=3
-
-                stages to a random temp table with 26*26*26 possible naming choices.
+                The TEMP table is created once per connection with the staging column types for
+                record_type and version, reused by subsequent loads on that connection, and
+                truncated after each load. An int greater than 0 is treated as True.
 
             version: str, Version, optional
                 The MDS version to target. By default, Version.mds_lower().
@@ -72,6 +121,16 @@ class DataFrame():
         Raise:
             UnsupportedVersionError
                 When an unsupported MDS version is specified.
+
+            ValueError
+                When an unrecognized method or unsupported dialect is specified, or geometry is used
+                with a non-PostgreSQL engine.
+
+        Return:
+            dict
+                The number of rows staged, and of those, inserted, updated, or ignored as conflicts.
+                Without stage_first, every row is counted as inserted. Dialects other than
+                postgresql count updated rows as inserted.
         """
         record_type = kwargs.pop("record_type")
         table = kwargs.pop("table")
@@ -84,32 +143,270 @@ class DataFrame():
         before_load = kwargs.get("before_load")
         stage_first = kwargs.get("stage_first")
         on_conflict_update = kwargs.get("on_conflict_update")
+        batch_size = kwargs.get("batch_size")
+        geometry = kwargs.get("geometry", False)
+        prepared = kwargs.get("prepared", True)
+
+        method = kwargs.get("method") or "insert"
+        if method not in METHODS:
+            raise ValueError(f"Unrecognized load method '{method}'. Valid methods: {', '.join(METHODS)}")
+
+        dialect = engine.dialect.name
+        if dialect not in sql.DIALECTS:
+            raise ValueError(f"Unsupported dialect '{dialect}'. Supported dialects: {', '.join(sql.DIALECTS)}")
+        if geometry and dialect != "postgresql":
+            raise ValueError(f"Loading PostGIS geometry requires a PostgreSQL engine, got: {dialect}")
 
         # run any pre-processors to transform the df
         if before_load is not None:
             transform = before_load(source, version)
             source = source if transform is None else transform
 
-        if not stage_first:
-            # append the data to an existing table
-            source.to_sql(table, engine, if_exists="append", index=False)
-            return
+        batch_size = batch_size or max(len(source), 1)
+        counts = dict.fromkeys(COUNTS, 0)
 
-        # insert this DataFrame into a fresh temp table
-        factor = stage_first if isinstance(stage_first, int) else 1
-        temp = f"{table}_tmp_{util.random_string(factor, chars=string.ascii_lowercase)}"
-        source.to_sql(temp, engine, if_exists="replace", index=False)
+        with self._begin(engine, kwargs.get("connection")) as conn:
+            for start in range(0, len(source), batch_size):
+                batch = source.iloc[start:start + batch_size]
 
-        # now insert from the temp table to the actual table
-        with engine.begin() as conn:
+                if stage_first:
+                    batch_counts = self._stage(batch, conn, record_type, table, version, method, on_conflict_update, geometry, prepared)
+                else:
+                    # append the data to an existing table
+                    self._write(batch, table, conn, method)
+                    batch_counts = dict(staged=len(batch), inserted=len(batch), updated=0, ignored=0)
+
+                counts = add_counts(counts, batch_counts)
+
+        return counts
+
+    @classmethod
+    def _stage(cls, df, conn, record_type, table, version, method, on_conflict_update=None, geometry=False, prepared=True):
+        """
+        Stage df in a TEMP table, then insert from there to the actual table.
+
+        Return the counts of rows staged, inserted, updated and ignored.
+        """
+        dialect = conn.dialect.name
+        temp, columns = cls._staging_table(conn, table, record_type, version, geometry)
+        staged = conn.info[STAGING_INFO]
+
+        df = df.reindex(columns=[c for c,_ in columns])
+        df = cls._timestamps_todatetime(df, [c for c,t in columns if t in TIMESTAMPS], version)
+
+        try:
+            cls._write(df, temp, conn, method)
+
+            query = None
+            query_kwargs = dict(on_conflict_update=on_conflict_update, version=version, geometry=geometry, dialect=dialect)
             if record_type == STATUS_CHANGES:
-                query = sql.insert_status_changes_from(temp, table, on_conflict_update=on_conflict_update, version=version)
+                query = sql.insert_status_changes_from(temp, table, **query_kwargs)
             elif record_type == TRIPS:
-                query = sql.insert_trips_from(temp, table, on_conflict_update=on_conflict_update, version=version)
-            if query is not None:
-                # move data using query and delete temp table
-                conn.execute(query)
-                conn.execute(f"DROP TABLE {temp}")
+                query = sql.insert_trips_from(temp, table, **query_kwargs)
+            inserted, updated = 0, 0
+            if query is not None and dialect == "postgresql":
+                inserted, updated = cls._execute(conn, sql.merge_counts(query), prepared).fetchone()
+            elif query is not None:
+                # without RETURNING (xmax = 0), rows inserted and updated can't be told apart
+                result = conn.execute(query)
+                inserted = result.fetchone()[0] if result.returns_rows else max(result.rowcount, 0)
+        except:
+            # the transaction is rolled back, possibly including the creation of the temp table
+            staged.pop(temp, None)
+            raise
+        finally:
+            # leave the temp table empty for the next batch on this connection
+            if temp in staged:
+                conn.execute(sql.truncate_table(temp, dialect))
+
+        return dict(staged=len(df), inserted=inserted, updated=updated, ignored=len(df) - inserted - updated)
+
+    @classmethod
+    @contextlib.contextmanager
+    def _begin(cls, engine, connection=None):
+        """
+        Use the given connection as-is, or begin a new transaction from engine.
+        """
+        if connection is not None:
+            yield connection
+        else:
+            with engine.begin() as conn:
+                yield conn
+
+    @classmethod
+    def _execute(cls, conn, statement, prepared=True):
+        """
+        Execute statement on conn, as a server-side prepared statement when prepared is True.
+
+        Statements are prepared the first time they are seen on a connection, tracked in conn.info.
+        """
+        if not prepared:
+            return conn.execute(statement)
+
+        name, prepare = sql.prepare(statement)
+        statements = conn.info.setdefault(PREPARED_INFO, set())
+
+        # PREPARE is not transactional, the statement outlives a rollback
+        if name not in statements:
+            conn.execute(prepare)
+            statements.add(name)
+
+        return conn.execute(sql.execute_prepared(name))
+
+    @classmethod
+    def _staging_table(cls, conn, table, record_type, version, geometry=False):
+        """
+        Get the name and (column, type) list of an empty TEMP staging table for table on this
+        connection, creating the staging table if needed.
+        """
+        temp = f"{table}_staging"
+        columns = sql.staging_columns(record_type, version, geometry, conn.dialect.name)
+        staged = conn.info.setdefault(STAGING_INFO, {})
+
+        # recreate when the staging columns changed, e.g. for a different version
+        if staged.get(temp) != columns:
+            conn.execute(sql.drop_temp_table(temp, conn.dialect.name))
+            conn.execute(sql.create_temp_table(temp, columns, conn.dialect.name))
+            staged[temp] = columns
+
+        return temp, columns
+
+    @classmethod
+    def _timestamps_todatetime(cls, df, cols, version):
+        """
+        For each cols in the df, convert MDS timestamps to UTC datetimes.
+
+        Numeric timestamps are interpreted as seconds (version < 0.3.0) or milliseconds since the
+        Unix epoch, anything else (e.g. datetime or ISO 8601 text) is parsed as-is.
+        """
+        unit = "s" if version < Version("0.3.0") else "ms"
+
+        for col in [c for c in cols if c in df]:
+            series = df[col]
+            if pd.api.types.is_datetime64_any_dtype(series):
+                df[col] = pd.to_datetime(series, utc=True)
+                continue
+            numeric = pd.to_numeric(series, errors="coerce")
+            converted = pd.to_datetime(numeric, unit=unit, utc=True)
+
+            # parse any remaining non-numeric values
+            others = series.notna() & numeric.isna()
+            if others.any():
+                converted[others] = pd.to_datetime(series[others], utc=True)
+
+            df[col] = converted
+
+        return df
+
+    @classmethod
+    def _write(cls, df, table, conn, method):
+        """
+        Write df to an existing table using method.
+        """
+        dialect = conn.dialect.name
+
+        if dialect != "postgresql":
+            df = cls._portable_frame(df)
+
+        if method == "copy" and dialect == "postgresql":
+            cls._copy(df, table, conn)
+        elif method == "copy" and dialect == "duckdb":
+            cls._append(df, table, conn)
+        else:
+            df.to_sql(table, conn, if_exists="append", index=False)
+
+    @classmethod
+    def _append(cls, df, table, conn):
+        """
+        Bulk load df into table with DuckDB, scanning the registered DataFrame in place.
+        """
+        view = f"{table}_frame"
+        columns = ",".join([f'"{c}"' for c in df.columns])
+
+        conn.connection.register(view, df)
+        try:
+            conn.execute(f'INSERT INTO "{table}" ({columns}) SELECT {columns} FROM "{view}"')
+        finally:
+            conn.connection.unregister(view)
+
+    @classmethod
+    def _copy(cls, df, table, conn):
+        """
+        Bulk load df into table with COPY FROM STDIN, streaming CSV from an in-memory buffer.
+        """
+        buffer = io.StringIO()
+        cls._copy_frame(df).to_csv(buffer, index=False, header=False, na_rep=COPY_NULL)
+        buffer.seek(0)
+
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(sql.copy_from_stdin(table, df.columns, null=COPY_NULL), buffer)
+        finally:
+            cursor.close()
+
+    @classmethod
+    def _copy_frame(cls, df):
+        """
+        Prepare a copy of df with values formatted for PostgreSQL's CSV input.
+        """
+        df = df.copy()
+
+        for col in df.columns:
+            series = df[col]
+            if series.dtype == "object":
+                # lists become array literals, dicts become JSON text
+                df[col] = series.apply(cls._copy_value)
+            elif series.dtype.kind == "f":
+                # integral floats (e.g. ints with missing values) would be written as "1.0"
+                values = series.dropna()
+                if len(values) > 0 and (values % 1 == 0).all():
+                    df[col] = series.astype("Int64")
+
+        return df
+
+    @classmethod
+    def _portable_frame(cls, df):
+        """
+        Prepare a copy of df with values that dialects other than PostgreSQL can store:
+        lists and dicts as JSON text, timestamps as naive UTC, and other objects (e.g. UUID) as text.
+        """
+        df = df.copy()
+
+        for col in df.columns:
+            series = df[col]
+            if series.dtype == "object":
+                df[col] = series.apply(cls._portable_value)
+            elif isinstance(series.dtype, pd.DatetimeTZDtype):
+                df[col] = series.dt.tz_convert(None)
+
+        return df
+
+    @classmethod
+    def _portable_value(cls, value):
+        """
+        Format a single object value for dialects other than PostgreSQL.
+        """
+        if isinstance(value, (list, tuple, dict)):
+            return json_dumps(value)
+        if value is None or isinstance(value, (str, bytes, numbers.Number, datetime.date, datetime.time)):
+            return value
+        return str(value)
+
+    @classmethod
+    def _copy_value(cls, value):
+        """
+        Format a single object value for PostgreSQL's CSV input.
+        """
+        if isinstance(value, (list, tuple)):
+            # array literal: NULL items unquoted, others quoted with backslashes and quotes escaped
+            items = [
+                "NULL" if v is None else '"' + str(v).replace("\\", "\\\\").replace('"', '\\"') + '"'
+                for v in value
+            ]
+            return "{" + ",".join(items) + "}"
+        if isinstance(value, dict):
+            return json_dumps(value)
+        return value
 
     @classmethod
     def can_load(cls, source):
@@ -146,6 +443,10 @@ class File(DataFrame):
         Raise:
             UnexpectedVersionError
                 When data is parsed with a version different from what was expected.
+
+        Return:
+            dict
+                The counts of rows loaded, see DataFrame.load().
         """
         record_type = kwargs.pop("record_type")
         version = Version(kwargs.get("version"))
@@ -165,8 +466,11 @@ class File(DataFrame):
         """
         Returns True if source a valid file source
         """
+        sources = source if isinstance(source, list) else [source]
+        if len(sources) == 0 or not all([isinstance(s, (str, pathlib.Path)) for s in _sample(sources)]):
+            return False
         try:
-            return DataFile(source).file_sources
+            return DataFile(None, sources).file_sources
         except:
             return False
 
@@ -200,23 +504,27 @@ class Records(DataFrame):
                 The engine used for connections to the database backend.
 
             Additional keyword arguments are passed-through to DataFrameLoader.load().
+
+        Return:
+            dict
+                The counts of rows loaded, see DataFrame.load().
         """
-        if isinstance(source, dict):
+        if isinstance(source, collections.abc.Mapping):
             source = [source]
 
         df = pd.DataFrame.from_records(source)
-        super().load(df, **kwargs)
+        return super().load(df, **kwargs)
 
     @classmethod
     def can_load(cls, source):
         """
-        True if source is one or more MDS Provider record dicts.
+        True if source is one or more MDS Provider record dicts (or other Mappings).
         """
-        if isinstance(source, dict):
+        if isinstance(source, collections.abc.Mapping):
             source = [source]
-        return isinstance(source, list) and all([
-            isinstance(d, dict) and "provider_id" in d and "device_id" in d
-            for d in source
+        return isinstance(source, list) and len(source) > 0 and all([
+            isinstance(d, collections.abc.Mapping) and "provider_id" in d and "device_id" in d
+            for d in _sample(source)
         ])
 
 
@@ -252,45 +560,121 @@ class Payloads(Records):
             engine: sqlalchemy.engine.Engine
                 The engine used for connections to the database backend.
 
+            batch_size: int, optional
+                Accumulate records across payloads into batches of this many rows, staging and
+                upserting each batch on a single connection, in a single transaction.
+                By default, load each payload separately.
+
             Additional keyword arguments are passed-through to DataFrameLoader.load().
+
+        Return:
+            dict
+                The counts of rows loaded, see DataFrame.load().
         """
         record_type = kwargs.pop("record_type")
         version = kwargs.get("version")
+        batch_size = kwargs.get("batch_size")
 
         if isinstance(source, dict):
             source = [source]
 
         kwargs["record_type"] = record_type
-        for payload in [p for p in source if record_type in p["data"]]:
+        payloads = [p for p in source if record_type in p["data"]]
+
+        for payload in payloads:
             if version and version != Version(payload["version"]):
                 raise UnexpectedVersionError(payload["version"], version)
 
-            records = payload["data"][record_type]
-            super().load(records, **kwargs)
+        counts = dict.fromkeys(COUNTS, 0)
+
+        if not batch_size:
+            for payload in payloads:
+                records = payload["data"][record_type]
+                counts = add_counts(counts, super().load(records, **kwargs))
+            return counts
+
+        # accumulate records across payloads, loading full batches on a single connection
+        with self._begin(kwargs["engine"], kwargs.get("connection")) as conn:
+            kwargs["connection"] = conn
+            batch = []
+
+            for payload in payloads:
+                batch.extend(payload["data"][record_type])
+                while len(batch) >= batch_size:
+                    counts = add_counts(counts, super().load(batch[:batch_size], **kwargs))
+                    batch = batch[batch_size:]
+
+            if len(batch) > 0:
+                counts = add_counts(counts, super().load(batch, **kwargs))
+
+        return counts
 
     @classmethod
     def can_load(cls, source):
         """
         True if source is one or more MDS Provider payload dicts.
         """
-        """
-        True if source is one or more MDS Provider record dicts.
-        """
         if isinstance(source, dict):
             source = [source]
-        return isinstance(source, list) and all([
+        return isinstance(source, list) and len(source) > 0 and all([
             isinstance(d, dict) and "version" in d and "data" in d
-            for d in source
+            for d in _sample(source)
         ])
 
 
+def add_counts(*counts):
+    """
+    Sum dicts of load counts (see COUNTS).
+    """
+    return dict([(c, sum([d.get(c, 0) for d in counts])) for c in COUNTS])
+
+
 def data_loaders():
     """
-    Return a list of all supported data loaders.
+    Return a tuple of all supported data loaders, most specific first.
+
+    The result is cached, and refreshed when a new data loader is defined.
     """
     def all_subs(cls):
         return set(cls.__subclasses__()).union(
             [s for c in cls.__subclasses__() for s in all_subs(c)]
         ).union([cls])
 
-    return all_subs(DataFrame)
+    if DataFrame._loaders is None:
+        DataFrame._loaders = tuple(sorted(all_subs(DataFrame), key=lambda c: (-len(c.__mro__), c.__name__)))
+
+    return DataFrame._loaders
+
+
+def data_loader(source):
+    """
+    Find a data loader that can load source.
+
+    The loader last used for the type of source is tried first, so repeated loads of similar
+    sources usually need a single can_load() check.
+
+    Parameters:
+        source: any
+            The data source to load.
+
+    Return:
+        type
+            The DataFrame subclass that can load source, or None when there isn't one.
+    """
+    cached = _dispatch.get(type(source))
+    if cached is not None and cached.can_load(source):
+        return cached
+
+    for loader in data_loaders():
+        if loader is not cached and loader.can_load(source):
+            _dispatch[type(source)] = loader
+            return loader
+
+    return None
+
+
+def _sample(items):
+    """
+    Get the first and last of a list of items, for constant-time checks of homogeneous lists.
+    """
+    return items if len(items) <= 2 else [items[0], items[-1]]
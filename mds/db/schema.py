@@ -0,0 +1,390 @@
+"""
+Generate and run DDL for MDS Provider database tables.
+"""
+
+import datetime
+
+from ..db.sql import column_type
+from ..schemas import STATUS_CHANGES, TRIPS, Schema
+from ..versions import UnsupportedVersionError, Version
+
+
+PARTITIONS = ["day", "month"]
+
+PRIMARY_KEYS = {
+    STATUS_CHANGES: ["provider_id", "device_id", "event_time", "event_type", "event_type_reason"],
+    TRIPS: ["provider_id", "trip_id"]
+}
+
+TIME_COLUMNS = {
+    STATUS_CHANGES: "event_time",
+    TRIPS: "end_time"
+}
+
+TIMESTAMP_COLUMNS = {
+    STATUS_CHANGES: ["event_time", "publication_time"],
+    TRIPS: ["start_time", "end_time", "publication_time"]
+}
+
+
+def enum_types(status_changes_schema, trips_schema):
+    """
+    Generate statements that create (or extend) the enum types used by MDS Provider tables.
+
+    Parameters:
+        status_changes_schema: Schema
+            The status_changes schema, defining event_types and event_type_reasons.
+
+        trips_schema: Schema
+            The trips schema, defining vehicle_types and propulsion_types.
+
+    Return:
+        list
+            A list of str statements.
+    """
+    reasons = []
+    for values in status_changes_schema.event_type_reasons.values():
+        reasons.extend([v for v in values if v not in reasons])
+
+    types = [
+        ("vehicle_types", trips_schema.vehicle_types),
+        ("propulsion_types", trips_schema.propulsion_types),
+        ("event_types", status_changes_schema.event_types),
+        ("event_type_reasons", reasons)
+    ]
+
+    statements = []
+    for name, values in types:
+        # create the type the first time, add any new values for later versions
+        statements.append(f"""
+        DO $$ BEGIN
+            CREATE TYPE {name} AS ENUM ();
+        EXCEPTION
+            WHEN duplicate_object THEN null;
+        END $$;
+        """)
+        statements.extend([f"ALTER TYPE {name} ADD VALUE IF NOT EXISTS '{v}'" for v in values])
+
+    return statements
+
+
+def columns(record_type, version=None, geometry=False, dialect="postgresql"):
+    """
+    Get the columns of a MDS Provider table.
+
+    Parameters:
+        record_type: str
+            The type of MDS data ("status_changes" or "trips").
+
+        version: str, Version, optional
+            The MDS version to target. By default, Version.mds_lower().
+
+        geometry: bool, optional
+            True to use PostGIS geometry columns for locations and routes. By default, False.
+
+        dialect: str, optional
+            The SQL dialect, one of mds.db.sql.DIALECTS. By default, postgresql.
+
+    Return:
+        list
+            A list of (column: str, type: str) tuples.
+    """
+    version = Version(version or Version.mds_lower())
+    if version.unsupported:
+        raise UnsupportedVersionError(version)
+
+    cols = [
+        ("provider_id", "uuid"),
+        ("provider_name", "text"),
+        ("device_id", "uuid"),
+        ("vehicle_id", "text"),
+        ("vehicle_type", "vehicle_types"),
+        ("propulsion_type", "propulsion_types[]")
+    ]
+
+    if record_type == STATUS_CHANGES:
+        cols.extend([
+            ("event_type", "event_types"),
+            ("event_type_reason", "event_type_reasons"),
+            ("event_time", "timestamp"),
+            ("event_location", "geometry(Point, 4326)" if geometry else "jsonb"),
+            ("battery_pct", "double precision")
+        ])
+        if version < Version("0.3.0"):
+            cols.append(("associated_trips", "uuid[]"))
+        else:
+            cols.extend([
+                ("publication_time", "timestamp"),
+                ("associated_trip", "uuid")
+            ])
+    elif record_type == TRIPS:
+        cols.extend([
+            ("trip_id", "uuid"),
+            ("trip_duration", "integer"),
+            ("trip_distance", "integer"),
+            ("route", "geometry(LineString, 4326)" if geometry else "jsonb"),
+            ("accuracy", "integer"),
+            ("start_time", "timestamp"),
+            ("end_time", "timestamp"),
+            ("parking_verification_url", "text"),
+            ("standard_cost", "integer"),
+            ("actual_cost", "integer")
+        ])
+        if version >= Version("0.3.0"):
+            cols.append(("publication_time", "timestamp"))
+        if geometry:
+            cols.extend([
+                ("start_location", "geometry(Point, 4326)"),
+                ("end_location", "geometry(Point, 4326)")
+            ])
+    else:
+        raise ValueError(f"Invalid record_type '{record_type}'.")
+
+    return [(c, column_type(t, dialect)) for c,t in cols]
+
+
+def create_table(record_type, table=None, schema=None, **kwargs):
+    """
+    Generate a "CREATE TABLE" statement for a MDS Provider table.
+
+    Columns that are required by the schema are NOT NULL. The primary key matches the columns
+    used to drop duplicates (see PRIMARY_KEYS), and includes the time column when partitioned,
+    as PostgreSQL requires of partitioned tables.
+
+    Parameters:
+        record_type: str
+            The type of MDS data ("status_changes" or "trips").
+
+        table: str, optional
+            The name of the table. By default, record_type.
+
+        schema: Schema, optional
+            The schema for record_type. By default, acquire the schema for version.
+
+        geometry: bool, optional
+            True to use PostGIS geometry columns for locations and routes. By default, False.
+
+        partition: str, optional
+            "day" or "month" to range partition the table by its time column (event_time for
+            status_changes, end_time for trips). By default, the table is not partitioned.
+
+        version: str, Version, optional
+            The MDS version to target. By default, Version.mds_lower().
+
+        dialect: str, optional
+            The SQL dialect, one of mds.db.sql.DIALECTS. By default, postgresql.
+            geometry and partition require postgresql.
+
+    Return:
+        str
+    """
+    version = Version(kwargs.get("version", Version.mds_lower()))
+    geometry = kwargs.get("geometry", False)
+    partition = kwargs.get("partition")
+    dialect = kwargs.get("dialect", "postgresql")
+    if partition is not None and partition not in PARTITIONS:
+        raise ValueError(f"Invalid partition '{partition}'. Valid partitions: {', '.join(PARTITIONS)}")
+    if (geometry or partition) and dialect != "postgresql":
+        raise ValueError(f"geometry and partition require the postgresql dialect, got: {dialect}")
+
+    table = table or record_type
+    schema = schema or Schema(record_type, version)
+    required = schema.required_item_fields
+
+    primary_key = list(PRIMARY_KEYS[record_type])
+    time_column = TIME_COLUMNS[record_type]
+    if partition and time_column not in primary_key:
+        primary_key.append(time_column)
+
+    definitions = [
+        f'"{c}" {t}' + (" NOT NULL" if c in required else "")
+        for c,t in columns(record_type, version, geometry, dialect)
+    ]
+    definitions.append(f"PRIMARY KEY ({','.join(primary_key)})")
+    definitions = ",\n        ".join(definitions)
+
+    partition_by = f"PARTITION BY RANGE ({time_column})" if partition else ""
+
+    return f"""
+    CREATE TABLE IF NOT EXISTS "{table}" (
+        {definitions}
+    )
+    {partition_by}
+    ;
+    """
+
+
+def create_indexes(record_type, table=None, geometry=False, dialect="postgresql"):
+    """
+    Generate "CREATE INDEX" statements for a MDS Provider table:
+
+    * a BRIN index on the time column, compact and fast for time-range scans of append-mostly data
+      (a plain index for dialects other than postgresql)
+    * a B-tree index on (provider_id, time column) for per-provider time-range queries
+    * GiST indexes on geometry columns, when geometry=True
+
+    Parameters:
+        record_type: str
+            The type of MDS data ("status_changes" or "trips").
+
+        table: str, optional
+            The name of the table. By default, record_type.
+
+        geometry: bool, optional
+            True to index PostGIS geometry columns. By default, False.
+
+        dialect: str, optional
+            The SQL dialect, one of mds.db.sql.DIALECTS. By default, postgresql.
+
+    Return:
+        list
+            A list of str statements.
+    """
+    table = table or record_type
+    time_column = TIME_COLUMNS[record_type]
+
+    if dialect == "postgresql":
+        time_index = f'CREATE INDEX IF NOT EXISTS "{table}_{time_column}_brin" ON "{table}" USING brin ({time_column})'
+    else:
+        time_index = f'CREATE INDEX IF NOT EXISTS "{table}_{time_column}_idx" ON "{table}" ({time_column})'
+
+    statements = [
+        time_index,
+        f'CREATE INDEX IF NOT EXISTS "{table}_provider_id_{time_column}_idx" ON "{table}" (provider_id, {time_column})'
+    ]
+
+    if geometry:
+        spatial = ["event_location"] if record_type == STATUS_CHANGES else ["route", "start_location", "end_location"]
+        statements.extend([
+            f'CREATE INDEX IF NOT EXISTS "{table}_{c}_gist" ON "{table}" USING gist ({c})'
+            for c in spatial
+        ])
+
+    return statements
+
+
+def create_partitions(table, start, end, partition="month", default=True):
+    """
+    Generate statements that create range partitions of a partitioned table.
+
+    Parameters:
+        table: str
+            The name of the partitioned table.
+
+        start: date, datetime
+            The beginning of the first partition, truncated to the partition interval.
+            None to only create the DEFAULT partition.
+
+        end: date, datetime
+            Partitions are created up to and including the one containing end.
+
+        partition: str, optional
+            "day" or "month" (the default) partitions.
+
+        default: bool, optional
+            True (default) to also create a DEFAULT partition, catching rows outside every range.
+            Rows in a DEFAULT partition must be moved before a partition covering them is created.
+
+    Return:
+        list
+            A list of str statements.
+    """
+    if partition not in PARTITIONS:
+        raise ValueError(f"Invalid partition '{partition}'. Valid partitions: {', '.join(PARTITIONS)}")
+
+    if partition == "day":
+        step = lambda d: d + datetime.timedelta(days=1)
+        fmt = "%Y%m%d"
+    else:
+        step = lambda d: datetime.date(d.year + d.month // 12, d.month % 12 + 1, 1)
+        fmt = "%Y%m"
+
+    statements = []
+    if start is not None:
+        current = datetime.date(start.year, start.month, start.day if partition == "day" else 1)
+        end = datetime.date(end.year, end.month, end.day)
+
+        while current <= end:
+            upper = step(current)
+            statements.append(
+                f'CREATE TABLE IF NOT EXISTS "{table}_{current.strftime(fmt)}" PARTITION OF "{table}" '
+                f"FOR VALUES FROM ('{current.isoformat()}') TO ('{upper.isoformat()}')"
+            )
+            current = upper
+
+    if default:
+        statements.append(f'CREATE TABLE IF NOT EXISTS "{table}_default" PARTITION OF "{table}" DEFAULT')
+
+    return statements
+
+
+def create(engine, record_type, table=None, **kwargs):
+    """
+    Create the enum types, table, partitions and indexes for MDS Provider data.
+
+    Enum types are only created for PostgreSQL; other dialects store their values as text.
+
+    Parameters:
+        engine: sqlalchemy.engine.Engine
+            The engine used for connections to the database backend.
+
+        record_type: str
+            The type of MDS data ("status_changes" or "trips").
+
+        table: str, optional
+            The name of the table. By default, record_type.
+
+        start: date, datetime, optional
+            With partition, the beginning of the first partition to create. The DEFAULT partition
+            is always created, so that a partitioned table without start still accepts rows.
+
+        end: date, datetime, optional
+            With partition, the end of the last partition to create. By default, start.
+
+        geometry: bool, optional
+            True to use PostGIS geometry columns for locations and routes. By default, False.
+
+        partition: str, optional
+            "day" or "month" to range partition the table by its time column.
+            By default, the table is not partitioned.
+
+        version: str, Version, optional
+            The MDS version to target. By default, Version.mds_lower().
+
+    Return:
+        str
+            The name of the table.
+    """
+    version = Version(kwargs.get("version", Version.mds_lower()))
+    if version.unsupported:
+        raise UnsupportedVersionError(version)
+
+    table = table or record_type
+    geometry = kwargs.get("geometry", False)
+    partition = kwargs.get("partition")
+    start = kwargs.get("start")
+    end = kwargs.get("end", start)
+
+    dialect = engine.dialect.name
+
+    status_changes, trips = Schema.status_changes(version), Schema.trips(version)
+    schema = status_changes if record_type == STATUS_CHANGES else trips
+
+    if dialect == "postgresql":
+        # ALTER TYPE ... ADD VALUE can't be used in the transaction that creates the type (or that
+        # uses the new value), so run the enum statements on their own, outside of any transaction
+        with engine.connect() as conn:
+            conn = conn.execution_options(isolation_level="AUTOCOMMIT")
+            for statement in enum_types(status_changes, trips):
+                conn.execute(statement)
+
+    statements = [create_table(record_type, table, schema, version=version, geometry=geometry, partition=partition, dialect=dialect)]
+    if partition:
+        statements.extend(create_partitions(table, start, end, partition))
+    statements.extend(create_indexes(record_type, table, geometry, dialect))
+
+    with engine.begin() as conn:
+        for statement in statements:
+            conn.execute(statement)
+
+    return table
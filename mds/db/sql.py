@@ -2,29 +2,383 @@
 Generate SQL for MDS Provider database CRUD.
 """
 
+import functools
+import hashlib
+
 from ..schemas import STATUS_CHANGES, TRIPS
 from ..versions import UnsupportedVersionError, Version
 
 
-_COMMON_INSERTS= [
-    "provider_id",
-    "provider_name",
-    "device_id",
-    "vehicle_id",
-    "vehicle_type",
-    "propulsion_type"
-]
+DIALECTS = ["duckdb", "postgresql", "sqlite"]
+
+STATEMENT_CACHE_SIZE = 256
+
+_V030 = Version("0.3.0")
+
+# how PostgreSQL column types are represented in the other dialects
+# SQLite has no array, JSON or enum types: these are stored as (JSON) text
+_DIALECT_TYPES = {
+    "duckdb": {
+        "double precision": "double",
+        "event_type_reasons": "varchar",
+        "event_types": "varchar",
+        "jsonb": "json",
+        "propulsion_types": "varchar",
+        "propulsion_types[]": "varchar[]",
+        "timestamptz": "timestamp",
+        "vehicle_types": "varchar"
+    },
+    "sqlite": {
+        "double precision": "real",
+        "event_type_reasons": "text",
+        "event_types": "text",
+        "jsonb": "text",
+        "propulsion_types": "text",
+        "propulsion_types[]": "text",
+        "timestamptz": "timestamp",
+        "uuid": "text",
+        "uuid[]": "text"
+    }
+}
+
+# the schema holding a session's TEMP tables
+_TEMP_SCHEMAS = {
+    "duckdb": "temp",
+    "postgresql": "pg_temp",
+    "sqlite": "temp"
+}
 
 _COMMON_SELECTS = [
-    "cast(provider_id as uuid)",
-    "provider_name",
-    "cast(device_id as uuid)",
-    "vehicle_id,"
-    "cast(vehicle_type as vehicle_types)",
-    "cast(propulsion_type as propulsion_types[])",
+    ("provider_id", "uuid"),
+    ("provider_name", None),
+    ("device_id", "uuid"),
+    ("vehicle_id", None),
+    ("vehicle_type", "vehicle_types"),
+    ("propulsion_type", "propulsion_types[]")
 ]
 
 
+_COMMON_STAGING = [
+    ("provider_id", "text"),
+    ("provider_name", "text"),
+    ("device_id", "text"),
+    ("vehicle_id", "text"),
+    ("vehicle_type", "text"),
+    ("propulsion_type", "text")
+]
+
+
+def column_type(pg_type, dialect="postgresql"):
+    """
+    Get the type used for a PostgreSQL column type in another SQL dialect.
+
+    Parameters:
+        pg_type: str
+            The PostgreSQL column type, e.g. uuid or jsonb.
+
+        dialect: str, optional
+            The SQL dialect, one of DIALECTS. By default, postgresql.
+
+    Return:
+        str
+    """
+    if dialect not in DIALECTS:
+        raise ValueError(f"Unsupported dialect '{dialect}'. Supported dialects: {', '.join(DIALECTS)}")
+
+    return _DIALECT_TYPES.get(dialect, {}).get(pg_type, pg_type)
+
+
+def _cast(column, pg_type, dialect="postgresql"):
+    """
+    Generate an expression casting a staged column to pg_type, as represented in dialect.
+    """
+    if pg_type is None or dialect == "sqlite":
+        return column
+
+    if dialect == "duckdb" and pg_type.endswith("[]"):
+        # lists are staged as JSON text
+        return f"cast(cast({column} as json) as {column_type(pg_type, dialect)})"
+
+    return f"cast({column} as {column_type(pg_type, dialect)})"
+
+
+def _timestamp(column, dialect="postgresql"):
+    """
+    Generate an expression for a staged timestamptz column as a UTC timestamp.
+
+    Dialects other than postgresql stage timestamps as UTC already.
+    """
+    return f"{column} at time zone 'UTC'" if dialect == "postgresql" else column
+
+
+def staging_columns(record_type, version=None, geometry=False, dialect="postgresql"):
+    """
+    Get the columns of a staging table for MDS data, typed as the data arrives from a DataFrame.
+
+    Timestamp columns are staged as timestamptz, and should be converted from their
+    version-specific numeric representation before staging.
+
+    Parameters:
+        record_type: str
+            The type of MDS data ("status_changes" or "trips").
+
+        version: str, Version, optional
+            The MDS version to target. By default, Version.mds_lower().
+
+        geometry: bool, optional
+            True to stage locations and routes as EWKT for PostGIS geometry columns, including the
+            extracted start_location and end_location of trips. By default, False.
+
+        dialect: str, optional
+            The SQL dialect, one of DIALECTS. By default, postgresql.
+
+    Return:
+        list
+            A list of (column: str, type: str) tuples.
+    """
+    return list(_staging_columns(record_type, str(version or Version.mds_lower()), bool(geometry), dialect))
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _staging_columns(record_type, version, geometry, dialect):
+    """
+    Memoized staging_columns(), keyed by hashable arguments.
+    """
+    version = Version(version)
+    if version.unsupported:
+        raise UnsupportedVersionError(version)
+
+    columns = list(_COMMON_STAGING)
+
+    if record_type == STATUS_CHANGES:
+        columns.extend([
+            ("event_type", "text"),
+            ("event_type_reason", "text"),
+            ("event_location", "text"),
+            ("battery_pct", "double precision"),
+            ("event_time", "timestamptz")
+        ])
+        if version < _V030:
+            columns.append(("associated_trips", "text"))
+        else:
+            columns.extend([
+                ("publication_time", "timestamptz"),
+                ("associated_trip", "text")
+            ])
+    elif record_type == TRIPS:
+        columns.extend([
+            ("trip_id", "text"),
+            ("trip_duration", "double precision"),
+            ("trip_distance", "double precision"),
+            ("route", "text"),
+            ("accuracy", "double precision"),
+            ("parking_verification_url", "text"),
+            ("standard_cost", "double precision"),
+            ("actual_cost", "double precision"),
+            ("start_time", "timestamptz"),
+            ("end_time", "timestamptz")
+        ])
+        if version >= _V030:
+            columns.append(("publication_time", "timestamptz"))
+        if geometry:
+            columns.extend([
+                ("start_location", "text"),
+                ("end_location", "text")
+            ])
+    else:
+        raise ValueError(f"Invalid record_type '{record_type}'.")
+
+    return tuple([(c, column_type(t, dialect)) for c,t in columns])
+
+
+def create_temp_table(table, columns, dialect="postgresql"):
+    """
+    Generate a "CREATE TEMP TABLE" statement, qualified with the dialect's temp schema.
+
+    TEMP tables are private to the session that creates them, are not written to the WAL,
+    and are dropped automatically when the session ends.
+
+    Parameters:
+        table: str
+            The name of the table to create.
+
+        columns: list
+            A list of (column: str, type: str) tuples.
+
+        dialect: str, optional
+            The SQL dialect, one of DIALECTS. By default, postgresql.
+
+    Return:
+        str
+    """
+    columns = ",".join([f'"{c}" {t}' for c,t in columns])
+    on_commit = "" if dialect == "sqlite" else "ON COMMIT PRESERVE ROWS"
+    return f"""CREATE TEMP TABLE {_TEMP_SCHEMAS[dialect]}."{table}" ({columns}) {on_commit}"""
+
+
+def drop_temp_table(table, dialect="postgresql"):
+    """
+    Generate a "DROP TABLE IF EXISTS" statement for a TEMP table.
+
+    The table is qualified with the dialect's temp schema, so that a permanent table of the same
+    name is never dropped instead.
+    """
+    return f'DROP TABLE IF EXISTS {_TEMP_SCHEMAS[dialect]}."{table}"'
+
+
+def truncate_table(table, dialect="postgresql"):
+    """
+    Generate a "TRUNCATE" statement, or "DELETE FROM" where TRUNCATE isn't supported.
+    """
+    return f'DELETE FROM "{table}"' if dialect == "sqlite" else f'TRUNCATE "{table}"'
+
+
+def copy_from_stdin(table, columns, null="\\N"):
+    """
+    Generate a "COPY... FROM STDIN" statement for CSV formatted data.
+
+    Parameters:
+        table: str
+            The name of the table to COPY into.
+
+        columns: list
+            The names of the columns, in the order they appear in the CSV data.
+
+        null: str, optional
+            The string representing a NULL value in the CSV data. By default \\N.
+
+    Return:
+        str
+    """
+    columns = ",".join([f'"{c}"' for c in columns])
+    return f"""COPY "{table}" ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{null}')"""
+
+
+def copy_to_stdout(query):
+    """
+    Generate a "COPY (query) TO STDOUT" statement for CSV formatted data with a header row.
+
+    Parameters:
+        query: str
+            The SELECT query whose results are copied. Any parameters must already be bound.
+
+    Return:
+        str
+    """
+    return f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)"
+
+
+def select_from(table, columns=None, **kwargs):
+    """
+    Generate a "SELECT... FROM... WHERE" statement filtering MDS data by provider and time range,
+    with pyformat parameters %(provider)s, %(start_time)s and %(end_time)s as requested.
+
+    Parameters:
+        table: str
+            The name of the table to SELECT FROM.
+
+        columns: list, optional
+            The names of the columns to SELECT. By default, all columns.
+
+        provider_column: str, optional
+            The column compared to the provider parameter, e.g. provider_id or provider_name.
+
+        time_column: str, optional
+            The column compared to the start_time and end_time parameters, and used for ordering.
+
+        start_time: bool, optional
+            True to filter for rows where time_column >= %(start_time)s.
+
+        end_time: bool, optional
+            True to filter for rows where time_column < %(end_time)s.
+
+        dialect: str, optional
+            The SQL dialect, one of DIALECTS. By default, postgresql.
+            Other dialects use named parameters (e.g. :provider) suitable for sqlalchemy.text().
+
+    Return:
+        str
+    """
+    provider_column = kwargs.get("provider_column")
+    time_column = kwargs.get("time_column")
+    dialect = kwargs.get("dialect", "postgresql")
+    param = (lambda p: f"%({p})s") if dialect == "postgresql" else (lambda p: f":{p}")
+
+    selects = ",".join([f'"{c}"' for c in columns]) if columns else "*"
+
+    conditions = []
+    if provider_column:
+        conditions.append(f'"{provider_column}" = {param("provider")}')
+    if time_column and kwargs.get("start_time"):
+        conditions.append(f'"{time_column}" >= {param("start_time")}')
+    if time_column and kwargs.get("end_time"):
+        conditions.append(f'"{time_column}" < {param("end_time")}')
+
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order_by = f'ORDER BY "{time_column}"' if time_column else ""
+
+    return f'SELECT {selects} FROM "{table}" {where} {order_by}'
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def merge_counts(insert):
+    """
+    Wrap an "INSERT... ON CONFLICT..." statement to count the rows it inserted and updated.
+
+    Rows are counted from RETURNING (xmax = 0): a new row version with no deleting transaction
+    was inserted, otherwise it replaced an existing row. Rows ignored by the conflict clause are
+    not returned. PostgreSQL only.
+
+    Parameters:
+        insert: str
+            The INSERT statement, e.g. from insert_status_changes_from() or insert_trips_from().
+
+    Return:
+        str
+            A statement returning a single row of (inserted, updated) counts.
+    """
+    insert = insert.strip().rstrip(";")
+
+    return f"""
+    WITH merged AS (
+        {insert}
+        RETURNING (xmax = 0) AS inserted
+    )
+    SELECT
+        count(*) FILTER (WHERE inserted) AS inserted,
+        count(*) FILTER (WHERE NOT inserted) AS updated
+    FROM merged
+    ;
+    """
+
+
+def prepare(statement):
+    """
+    Generate a "PREPARE" statement for a PostgreSQL server-side prepared statement.
+
+    The name of the prepared statement is derived from its text, so identical statements are
+    prepared once per session.
+
+    Parameters:
+        statement: str
+            The statement to prepare, without parameters.
+
+    Return:
+        tuple (name: str, prepare: str)
+    """
+    statement = statement.strip().rstrip(";").rstrip()
+    name = f"mds_{hashlib.md5(statement.encode()).hexdigest()}"
+
+    return name, f"PREPARE {name} AS {statement}"
+
+
+def execute_prepared(name):
+    """
+    Generate an "EXECUTE" statement for a prepared statement.
+    """
+    return f"EXECUTE {name}"
+
+
 def on_conflict_statement(on_conflict_update=None):
     """
     Generate an appropriate "ON CONFLICT..." statement.
@@ -49,6 +403,40 @@ def on_conflict_statement(on_conflict_update=None):
     return "ON CONFLICT DO NOTHING"
 
 
+def _statement_key(**kwargs):
+    """
+    Normalize the keyword arguments of an insert statement generator into a hashable cache key:
+    (version: str, geometry: bool, dialect: str, on_conflict: str).
+    """
+    version = str(kwargs.get("version") or Version.mds_lower())
+    geometry = bool(kwargs.get("geometry", False))
+    dialect = kwargs.get("dialect", "postgresql")
+    on_conflict = on_conflict_statement(kwargs.get("on_conflict_update"))
+
+    return version, geometry, dialect, on_conflict
+
+
+def _insert_from(source_table, dest_table, inserts, selects, on_conflict, dialect="postgresql"):
+    """
+    Generate an "INSERT INTO... SELECT...FROM" statement.
+    """
+    inserts = ",".join(inserts)
+    selects = ",".join(selects)
+
+    # SQLite needs a WHERE clause to tell an upsert's ON CONFLICT from a join constraint
+    where = "WHERE true" if dialect == "sqlite" else ""
+
+    return f"""
+    INSERT INTO "{dest_table}"
+    ({inserts})
+    SELECT {selects}
+    FROM "{source_table}"
+    {where}
+    { on_conflict }
+    ;
+    """
+
+
 def insert_status_changes_from(source_table, dest_table=STATUS_CHANGES, **kwargs):
     """
     Generate an "INSERT INTO... SELECT...FROM" statement for status_changes.
@@ -60,6 +448,13 @@ def insert_status_changes_from(source_table, dest_table=STATUS_CHANGES, **kwargs
         dest_table: str, optional
             The name of the table to INSERT INTO, by default status_changes.
 
+        dialect: str, optional
+            The SQL dialect, one of DIALECTS. By default, postgresql.
+
+        geometry: bool, optional
+            True to insert event_location as PostGIS geometry from staged EWKT.
+            False (default) to insert as jsonb.
+
         on_conflict_update: tuple (condition: str, actions: list), dict, optional
             See on_conflict_statement().
 
@@ -69,63 +464,39 @@ def insert_status_changes_from(source_table, dest_table=STATUS_CHANGES, **kwargs
     Return:
         str
     """
-    version = Version(kwargs.pop("version", Version.mds_lower()))
-    if version.unsupported:
-        raise UnsupportedVersionError(version)
+    return _insert_status_changes_from(source_table, dest_table, *_statement_key(**kwargs))
 
-    on_conflict_update = kwargs.pop("on_conflict_update", None)
-    on_conflict = on_conflict_statement(on_conflict_update)
 
-    inserts = list(_COMMON_INSERTS)
-    inserts.extend([
-        "event_type",
-        "event_type_reason",
-        "event_location",
-        "battery_pct"
-    ])
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _insert_status_changes_from(source_table, dest_table, version, geometry, dialect, on_conflict):
+    """
+    Memoized insert_status_changes_from(), keyed by hashable arguments.
+    """
+    version = Version(version)
+    if version.unsupported:
+        raise UnsupportedVersionError(version)
 
     selects = list(_COMMON_SELECTS)
     selects.extend([
-        "cast(event_type as event_types)",
-        "cast(event_type_reason as event_type_reasons)",
-        "cast(event_location as jsonb)",
-        "battery_pct"
+        ("event_type", "event_types"),
+        ("event_type_reason", "event_type_reasons"),
+        ("event_location", "geometry" if geometry else "jsonb"),
+        ("battery_pct", None)
     ])
 
-    if version < Version("0.3.0"):
-        inserts.extend([
-            "event_time",
-            "associated_trips"
-        ])
-
-        selects.extend([
-            "to_timestamp(event_time) at time zone 'UTC'",
-            "cast(associated_trips as uuid[])"
-        ])
+    if version < _V030:
+        selects.append(("associated_trips", "uuid[]"))
     else:
-        inserts.extend([
-            "event_time",
-            "publication_time",
-            "associated_trip"
-        ])
+        selects.append(("associated_trip", "uuid"))
 
-        selects.extend([
-            "to_timestamp(cast(event_time as double precision) / 1000.0) at time zone 'UTC'",
-            "to_timestamp(cast(publication_time as double precision) / 1000.0) at time zone 'UTC'",
-            "cast(associated_trip as uuid)"
-        ])
+    inserts = [c for c,_ in selects]
+    selects = [_cast(c, t, dialect) for c,t in selects]
 
-    inserts = ",".join(inserts)
-    selects = ",".join(selects)
+    timestamps = ["event_time"] if version < _V030 else ["event_time", "publication_time"]
+    inserts.extend(timestamps)
+    selects.extend([_timestamp(c, dialect) for c in timestamps])
 
-    return f"""
-    INSERT INTO "{dest_table}"
-    ({inserts})
-    SELECT {selects}
-    FROM "{source_table}"
-    { on_conflict }
-    ;
-    """
+    return _insert_from(source_table, dest_table, inserts, selects, on_conflict, dialect)
 
 
 def insert_trips_from(source_table, dest_table=TRIPS, **kwargs):
@@ -139,6 +510,13 @@ def insert_trips_from(source_table, dest_table=TRIPS, **kwargs):
         dest_table: str, optional
             The name of the table to INSERT INTO, by default trips.
 
+        dialect: str, optional
+            The SQL dialect, one of DIALECTS. By default, postgresql.
+
+        geometry: bool, optional
+            True to insert route, start_location and end_location as PostGIS geometry from staged EWKT.
+            False (default) to insert as jsonb.
+
         on_conflict_update: tuple (condition: str, actions: list), dict, optional
             See on_conflict_statement().
 
@@ -148,68 +526,43 @@ def insert_trips_from(source_table, dest_table=TRIPS, **kwargs):
     Return:
         str
     """
-    version = Version(kwargs.pop("version", Version.mds_lower()))
+    return _insert_trips_from(source_table, dest_table, *_statement_key(**kwargs))
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _insert_trips_from(source_table, dest_table, version, geometry, dialect, on_conflict):
+    """
+    Memoized insert_trips_from(), keyed by hashable arguments.
+    """
+    version = Version(version)
     if version.unsupported:
         raise UnsupportedVersionError(version)
 
-    on_conflict_update = kwargs.pop("on_conflict_update", None)
-    on_conflict = on_conflict_statement(on_conflict_update)
-
-    inserts = list(_COMMON_INSERTS)
-    inserts.extend([
-        "trip_id",
-        "trip_duration",
-        "trip_distance",
-        "route",
-        "accuracy",
-        "parking_verification_url",
-        "standard_cost",
-        "actual_cost"
-    ])
-
     selects = list(_COMMON_SELECTS)
     selects.extend([
-        "cast(trip_id as uuid)",
-        "trip_duration",
-        "trip_distance",
-        "cast(route as jsonb)",
-        "accuracy",
-        "parking_verification_url,"
-        "standard_cost,"
-        "actual_cost"
+        ("trip_id", "uuid"),
+        ("trip_duration", None),
+        ("trip_distance", None),
+        ("route", "geometry" if geometry else "jsonb"),
+        ("accuracy", None),
+        ("parking_verification_url", None),
+        ("standard_cost", None),
+        ("actual_cost", None)
     ])
 
-    if version < Version("0.3.0"):
-        inserts.extend([
-            "start_time",
-            "end_time"
-        ])
-
+    if geometry:
         selects.extend([
-            "to_timestamp(start_time) at time zone 'UTC'",
-            "to_timestamp(end_time) at time zone 'UTC'"
-        ])
-    else:
-        inserts.extend([
-            "start_time",
-            "end_time",
-            "publication_time",
+            ("start_location", "geometry"),
+            ("end_location", "geometry")
         ])
 
-        selects.extend([
-            "to_timestamp(cast(start_time as double precision) / 1000.0) at time zone 'UTC'",
-            "to_timestamp(cast(end_time as double precision) / 1000.0) at time zone 'UTC'",
-            "to_timestamp(cast(publication_time as double precision) / 1000.0) at time zone 'UTC'",
-        ])
+    inserts = [c for c,_ in selects]
+    selects = [_cast(c, t, dialect) for c,t in selects]
 
-    inserts = ",".join(inserts)
-    selects = ",".join(selects)
+    timestamps = ["start_time", "end_time"]
+    if version >= _V030:
+        timestamps.append("publication_time")
+    inserts.extend(timestamps)
+    selects.extend([_timestamp(c, dialect) for c in timestamps])
 
-    return f"""
-    INSERT INTO "{dest_table}"
-    ({inserts})
-    SELECT {selects}
-    FROM "{source_table}"
-    { on_conflict }
-    ;
-    """
+    return _insert_from(source_table, dest_table, inserts, selects, on_conflict, dialect)
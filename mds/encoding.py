@@ -2,23 +2,78 @@
 Encoding and decoding MDS Provider data.
 """
 
+import collections.abc
 import json
 import datetime
+import math
 import pathlib
 import uuid
 
 import dateutil.parser
 import shapely.geometry
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 import mds.geometry
 from .versions import UnsupportedVersionError, Version
 
 
+def json_dumps(obj):
+    """
+    Serialize obj to a JSON str, using the fast orjson backend when it is installed.
+
+    The standard library fallback produces the same output as orjson: compact separators, non-ASCII
+    characters as-is, NaN and Infinity as null, and dates, times and UUIDs as ISO 8601 and str.
+
+    Parameters:
+        obj: dict, list, or any JSON-serializable object
+            The object to serialize.
+
+    Return:
+        str
+    """
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode()
+        except TypeError:
+            # e.g. dicts with non-str keys, which the standard library supports
+            pass
+    return json.dumps(_json_finite(obj), default=_json_default, allow_nan=False, ensure_ascii=False, separators=(",", ":"))
+
+
+def _json_finite(obj):
+    """
+    Replace NaN and Infinity floats in obj with None, which (unlike NaN) is valid JSON.
+    """
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, dict):
+        return {k: _json_finite(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_json_finite(v) for v in obj]
+    return obj
+
+
+def _json_default(obj):
+    """
+    Serialize the types orjson supports natively that the standard library does not.
+    """
+    if isinstance(obj, (datetime.datetime, datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
 class JsonEncoder(json.JSONEncoder):
     """
     Version-aware encoder for MDS json types:
 
     * datetime to date_format or str
+    * Mapping (e.g. mds.fake records) to dict
     * Path to str
     * Point/Polygon to GeoJSON Feature dict
     * tuple to list
@@ -72,6 +127,9 @@ class JsonEncoder(json.JSONEncoder):
         if isinstance(obj, Version):
             return str(obj)
 
+        if isinstance(obj, collections.abc.Mapping):
+            return obj.to_dict() if hasattr(obj, "to_dict") else dict(obj)
+
         return json.JSONEncoder.default(self, obj)
 
 
@@ -2,4 +2,5 @@
 Generate fake MDS Provider data.
 """
 
-from .provider import ProviderDataGenerator
+from .provider import generate, ProviderDataGenerator
+from .server import ProviderServer
@@ -0,0 +1,102 @@
+"""
+Track the state of a fleet of fake devices.
+"""
+
+import numpy as np
+
+
+class Fleet():
+    """
+    The state of a fleet of devices during service, indexed by device slot.
+
+    Each device is assigned a slot, its position in devices, and its per-device state is kept in
+    arrays indexable by slot, so that lookups and updates don't depend on the size of the fleet.
+    """
+
+    def __init__(self, devices, times=None, locations=None):
+        """
+        Initialize a new Fleet.
+
+        Parameters:
+            devices: list
+                The devices in the fleet. See ProviderDataGenerator.devices().
+
+            times: list, optional
+                The time of the last event for each device.
+
+            locations: list, optional
+                The location (GeoJSON Feature) of the last event for each device.
+        """
+        N = len(devices)
+
+        self.devices = list(devices)
+        self.slots = dict([(d["device_id"], i) for i,d in enumerate(self.devices)])
+
+        self.active = np.zeros(N, dtype=bool)
+        self.removed = np.zeros(N, dtype=bool)
+        self.times = np.empty(N, dtype=object)
+        self.locations = np.empty(N, dtype=object)
+
+        if times is not None:
+            self.times[:] = times
+        if locations is not None:
+            self.update(np.arange(N), locations=locations)
+
+    def __len__(self):
+        return len(self.devices)
+
+    def __repr__(self):
+        return f"<mds.fake.fleet.Fleet ({len(self)} devices, {self.active.sum()} active)>"
+
+    def at(self, slots):
+        """
+        Get the list of devices in slots.
+        """
+        return [self.devices[s] for s in slots]
+
+    def slot(self, device):
+        """
+        Get the slot of device, by its device_id.
+        """
+        return self.slots[device["device_id"]]
+
+    def activate(self, slots):
+        """
+        Put the devices in slots into service.
+        """
+        self.active[slots] = True
+        self.removed[slots] = False
+
+    def deactivate(self, slots):
+        """
+        Take the devices in slots out of service, e.g. for recharging.
+        """
+        self.active[slots] = False
+        self.removed[slots] = True
+
+    def update(self, slots, times=None, locations=None):
+        """
+        Record the time and/or location of the latest event for the devices in slots.
+        """
+        slots = np.atleast_1d(slots)
+
+        if times is not None:
+            self.times[slots] = times
+        if locations is not None:
+            # assign one at a time, numpy would treat sequences of dicts ambiguously
+            for slot, location in zip(slots, locations):
+                self.locations[slot] = location
+
+    @property
+    def active_slots(self):
+        """
+        The slots of devices in service.
+        """
+        return np.flatnonzero(self.active)
+
+    @property
+    def removed_slots(self):
+        """
+        The slots of devices taken out of service.
+        """
+        return np.flatnonzero(self.removed)
@@ -3,40 +3,148 @@ Generating random geometry.
 """
 
 import math
-import random
 
-import shapely.ops
+import numpy as np
+import shapely
 import shapely.geometry
+import shapely.ops
+import shapely.prepared
+
+from ..fake.util import default_rng
+
 
+EARTH_RADIUS = 6378100 # meters
 
-def point_within(boundary):
+
+def prepare(boundary):
     """
-    Create a random point somewhere within the boundary.
+    Prepare boundary for fast, repeated containment tests with contains_xy().
 
     Parameters:
         boundary: shapely.geometry.Polygon
             The geometry of the boundary.
 
     Return:
-        shapely.geometry.Point
-            A point inside the boundary.
+        shapely.geometry.Polygon, shapely.prepared.PreparedGeometry
+            The prepared geometry.
+    """
+    if hasattr(shapely, "prepare"):
+        # Shapely 2 prepares geometry in place
+        shapely.prepare(boundary)
+        return boundary
+
+    return shapely.prepared.prep(boundary)
+
+
+def contains_xy(prepared, x, y):
+    """
+    Test whether the coordinates x, y are within the (prepared) boundary.
+
+    Parameters:
+        prepared: shapely.geometry.Polygon, shapely.prepared.PreparedGeometry
+            The geometry of the boundary. See prepare().
+
+        x: numpy.ndarray
+            The x coordinates (longitudes) to test.
+
+        y: numpy.ndarray
+            The y coordinates (latitudes) to test.
+
+    Return:
+        numpy.ndarray
+            A bool array, True where the coordinates are within the boundary.
+    """
+    if hasattr(shapely, "contains_xy"):
+        return shapely.contains_xy(prepared, x, y)
+
+    # Shapely < 2
+    from shapely import vectorized
+    return vectorized.contains(prepared, x, y)
+
+
+def feature(point, **properties):
+    """
+    Create a GeoJSON Feature for a point, equivalent to mds.geometry.to_feature(point, properties)
+    without the round trip through shapely.geometry.mapping().
+
+    Parameters:
+        point: shapely.geometry.Point
+            The geometry defining this Feature.
+
+        Additional keyword arguments are the Feature's properties.
+
+    Return:
+        dict
+            The GeoJSON Feature object.
+    """
+    return dict(type="Feature", properties=properties, geometry=dict(coordinates=[point.x, point.y], type="Point"))
+
+
+def points_within(boundary, N, rng=None):
     """
+    Create N random points uniformly distributed within the boundary.
+
+    Candidates are drawn from the boundary's bounding box in batches and tested against the
+    prepared boundary all at once, sizing each batch by the fraction of the box the boundary covers.
+
+    Parameters:
+        boundary: shapely.geometry.Polygon
+            The geometry of the boundary.
+
+        N: int
+            The number of points to create.
+
+        rng: numpy.random.Generator, optional
+            The source of randomness. By default, unpredictable.
+
+    Return:
+        list
+            A list of N shapely.geometry.Point inside the boundary.
+    """
+    if N < 1:
+        return []
+
+    rng = default_rng(rng)
+
     # expand the bounds into the "4 corners"
     min_x, min_y, max_x, max_y = boundary.bounds
+    box = (max_x - min_x) * (max_y - min_y)
+    coverage = max(boundary.area / box, 0.01) if box > 0 else 1
+
+    prepared = prepare(boundary)
+    xs, ys, count = [], [], 0
+
+    # loop until we get enough interior points
+    while count < N:
+        size = int((N - count) / coverage * 1.1) + 16
+        x, y = rng.uniform(min_x, max_x, size), rng.uniform(min_y, max_y, size)
+        inside = contains_xy(prepared, x, y)
+        xs.append(x[inside])
+        ys.append(y[inside])
+        count += inside.sum()
+
+    return _points(np.concatenate(xs)[:N], np.concatenate(ys)[:N])
+
+
+def point_within(boundary, rng=None):
+    """
+    Create a random point somewhere within the boundary.
 
-    # helper computes a new random point
-    def compute():
-        return shapely.geometry.Point(random.uniform(min_x, max_x), random.uniform(min_y, max_y))
+    Parameters:
+        boundary: shapely.geometry.Polygon
+            The geometry of the boundary.
 
-    # loop until we get an interior point
-    point = compute()
-    while not boundary.contains(point):
-        point = compute()
+        rng: numpy.random.Generator, optional
+            The source of randomness. By default, unpredictable.
 
-    return point
+    Return:
+        shapely.geometry.Point
+            A point inside the boundary.
+    """
+    return points_within(boundary, 1, rng)[0]
 
 
-def point_nearby(point, dist, bearing=None, boundary=None):
+def point_nearby(point, dist, bearing=None, boundary=None, rng=None):
     """
     Create a random point nearby another point.
 
@@ -59,42 +167,185 @@ def point_nearby(point, dist, bearing=None, boundary=None):
             If it proves difficult to find a point at the specified distance within the boundary,
             the returned point may lie less than dist meters from point.
 
+        rng: numpy.random.Generator, optional
+            The source of randomness. By default, unpredictable.
+
     Return:
         shapely.geometry.Point
             The newly calculated point.
     """
-    if boundary is None:
-        lat1 = math.radians(point.y)
-        lon1 = math.radians(point.x)
-        ang_dist = dist / 6378100 # radius of Earth in meters
-        bearing = random.uniform(0, 2*math.pi) if bearing is None else bearing
+    return points_nearby([point], dist, bearing, boundary, rng)[0]
+
 
-        # calc the new latitude
-        lat2 = math.asin(math.sin(lat1) * math.cos(ang_dist) +
-                        math.cos(lat1) * math.sin(ang_dist) * math.cos(bearing))
+def points_nearby(points, dists, bearings=None, boundary=None, rng=None):
+    """
+    Create a random point nearby each of many points, all at once. See point_nearby().
+
+    With a boundary, destinations outside of it are recomputed in rounds: first with new random
+    bearings (up to MAX_TRIES rounds, when bearings is None), then by shrinking their distances
+    until they fall inside.
+
+    Parameters:
+        points: list
+            The shapely.geometry.Point references from which to generate new points.
 
-        # calc the new longitude
-        lon2 = lon1 + math.atan2(math.sin(bearing) * math.sin(ang_dist) * math.cos(lat1),
-                                math.cos(ang_dist) - math.sin(lat1) * math.sin(lat2))
+        dists: numeric, array-like
+            The distance(s) in meters away from the reference points to generate the new points.
+
+        bearings: numeric, array-like, optional
+            The bearing(s) in radians away from the reference points to generate the new points.
+            By default, random.
+
+        boundary: shapely.geometry.Polygon, optional
+            The returned points should lie within this boundary if possible.
+
+        rng: numpy.random.Generator, optional
+            The source of randomness. By default, unpredictable.
+
+    Return:
+        list
+            The newly calculated shapely.geometry.Point, corresponding to points.
+    """
+    N = len(points)
+    if N < 1:
+        return []
 
-        # return the new point
-        return shapely.geometry.Point(math.degrees(lon2), math.degrees(lat2))
+    rng = default_rng(rng)
+
+    lon = np.array([p.x for p in points], dtype=float)
+    lat = np.array([p.y for p in points], dtype=float)
+    dist = np.broadcast_to(np.asarray(dists, dtype=float), (N,)).copy()
+
+    if bearings is None:
+        bearing = rng.uniform(0, 2*math.pi, N)
     else:
-        MAX_TRIES = 50 if bearing is None else 1
+        bearing = np.broadcast_to(np.asarray(bearings, dtype=float), (N,)).copy()
+
+    x, y = destinations(lon, lat, dist, bearing)
+
+    if boundary is None:
+        return _points(x, y)
+
+    prepared = prepare(boundary)
+    outside = np.flatnonzero(~contains_xy(prepared, x, y))
+
+    # try other bearings for the points that landed outside
+    MAX_TRIES = 50 if bearings is None else 1
+    for _ in range(MAX_TRIES - 1):
+        if outside.size == 0:
+            break
+        bearing[outside] = rng.uniform(0, 2*math.pi, outside.size)
+        x[outside], y[outside] = destinations(lon[outside], lat[outside], dist[outside], bearing[outside])
+        outside = outside[~contains_xy(prepared, x[outside], y[outside])]
+
+    # If we got here it's possible there was no point at that exact distance and bearing
+    # from our starting point within the boundary; or maybe we were just unlucky.
+    # Shrink the distance to the endpoint until we find one inside the boundary.
+    if outside.size > 0 and not contains_xy(prepared, lon[outside], lat[outside]).all():
+        raise ValueError("Cannot find points nearby starting points outside the given boundary.")
+
+    while outside.size > 0:
+        dist[outside] = dist[outside] * 0.9
+        x[outside], y[outside] = destinations(lon[outside], lat[outside], dist[outside], bearing[outside])
+        outside = outside[~contains_xy(prepared, x[outside], y[outside])]
+
+    return _points(x, y)
+
+
+def waypoints(start, end, N, jitter=0.0, rng=None):
+    """
+    Create N waypoints along a route from start to end.
+
+    Waypoints are interpolated along the straight line between start and end, and displaced by
+    random (normally distributed) offsets that taper to zero at either end of the route.
 
-        for _ in range(MAX_TRIES):
-            end_point = point_nearby(point, dist, bearing)
-            if boundary.contains(end_point):
-                return end_point
+    Parameters:
+        start: shapely.geometry.Point
+            The start of the route.
+
+        end: shapely.geometry.Point
+            The end of the route.
+
+        N: int
+            The number of waypoints, including start and end (at least 2).
+
+        jitter: numeric, optional
+            The standard deviation in meters of the random offsets. By default, 0.
+
+        rng: numpy.random.Generator, optional
+            The source of randomness. By default, unpredictable.
+
+    Return:
+        tuple (x: numpy.ndarray, y: numpy.ndarray, progress: numpy.ndarray)
+            The longitudes and latitudes of the waypoints, and the fraction of the route's length
+            traveled at each waypoint.
+    """
+    if N < 2:
+        raise ValueError(f"A route requires at least 2 waypoints, got: {N}")
 
-        # If we got here it's possible there was no point at that exact distance and bearing
-        # from our starting point within the boundary; or maybe we were just unlucky.
-        # Shrink the distance to the endpoint until we find one inside the boundary.
-        if not boundary.contains(point):
-            raise ValueError(f"Cannot find point nearby the starting point {point}, which is outside the given boundary.")
+    rng = default_rng(rng)
+
+    fraction = np.linspace(0, 1, N)
+    x = start.x + fraction * (end.x - start.x)
+    y = start.y + fraction * (end.y - start.y)
+
+    if jitter > 0:
+        # offsets in meters, converted to degrees at the route's latitude
+        taper = np.sin(np.pi * fraction)
+        dy = rng.normal(0, jitter, N) * taper / EARTH_RADIUS
+        dx = rng.normal(0, jitter, N) * taper / (EARTH_RADIUS * np.cos(np.radians(y)))
+        x = x + np.degrees(dx)
+        y = y + np.degrees(dy)
+
+    # the (planar) cumulative length along the route
+    lengths = np.hypot(np.diff(x) * np.cos(np.radians(y[1:])), np.diff(y))
+    traveled = np.concatenate([[0], np.cumsum(lengths)])
+    progress = traveled / traveled[-1] if traveled[-1] > 0 else fraction
+
+    return x, y, progress
+
+
+def destinations(lon, lat, dist, bearing):
+    """
+    Compute the destinations at distances and bearings from starting coordinates, with the Haversine formula.
 
-        while not boundary.contains(end_point):
-            dist = dist * 0.9
-            end_point = point_nearby(point, dist, bearing)
+    Parameters:
+        lon: numpy.ndarray
+            The starting longitudes in degrees.
+
+        lat: numpy.ndarray
+            The starting latitudes in degrees.
+
+        dist: numpy.ndarray
+            The distances in meters.
+
+        bearing: numpy.ndarray
+            The bearings in radians.
+
+    Return:
+        tuple (lon: numpy.ndarray, lat: numpy.ndarray)
+            The destination longitudes and latitudes in degrees.
+    """
+    lat1 = np.radians(lat)
+    lon1 = np.radians(lon)
+    ang_dist = dist / EARTH_RADIUS
+
+    # calc the new latitude
+    lat2 = np.arcsin(np.sin(lat1) * np.cos(ang_dist) +
+                     np.cos(lat1) * np.sin(ang_dist) * np.cos(bearing))
+
+    # calc the new longitude
+    lon2 = lon1 + np.arctan2(np.sin(bearing) * np.sin(ang_dist) * np.cos(lat1),
+                             np.cos(ang_dist) - np.sin(lat1) * np.sin(lat2))
+
+    return np.degrees(lon2), np.degrees(lat2)
+
+
+def _points(x, y):
+    """
+    Create a list of shapely.geometry.Point from arrays of coordinates.
+    """
+    if hasattr(shapely, "points"):
+        return list(shapely.points(x, y))
 
-        return end_point
+    return [shapely.geometry.Point(px, py) for px, py in zip(x, y)]
@@ -2,16 +2,19 @@
 Generating fake MDS Provider data.
 """
 
+import concurrent.futures
 import datetime
 import math
-import random
-import uuid
 
-import scipy.stats
+import numpy as np
 
 import mds.geometry
 from ..fake import geometry, util
-from ..schemas import Schema
+from ..fake.fleet import Fleet
+from ..fake.records import StatusChange, Trip
+from ..files import DataFile, PayloadWriter
+from ..providers import Provider
+from ..schemas import STATUS_CHANGES, TRIPS, Schema
 from ..versions import Version
 
 
@@ -21,6 +24,8 @@ EVENT_TIME = "event_time"
 PUBLICATION_TIME = "publication_time"
 PROPULSION = "propulsion_type"
 
+_V030 = Version("0.3.0")
+
 
 class ProviderDataGenerator():
     """
@@ -29,36 +34,67 @@ class ProviderDataGenerator():
 
     TD_HOUR = datetime.timedelta(seconds=3600)
 
+    # trip durations in minutes are gamma distributed, see device_trip()
+    TRIP_DURATION_SHAPE, TRIP_DURATION_SCALE = 3, 4.5
+
+    # trip accuracy in meters is Rayleigh distributed with median ~5m
+    ACCURACY_SCALE = 5
+
     def __init__(self, boundary, **kwargs):
         """
         Initialize a new DataGenerator using the provided context.
 
         Parameters:
-            boundary: str
-                The path to a geoJSON file with boundary geometry within which to generate data.
+            boundary: str, shapely.geometry.Polygon
+                The path to a geoJSON file with boundary geometry within which to generate data;
+                or the boundary geometry itself.
 
             speed: int, optional
                 The average speed of devices in meters/second.
 
             vehicle_types: str, list, optional
                 Comma-separated string or list of vehicle_types to use for generation.
+                By default, all vehicle_types in the trips schema for version.
 
             propulsion_types: str, list, optional.
                 Comma-separated string or list of propulsion_types to use for generation.
+                By default, all propulsion_types in the trips schema for version.
 
             version: str, Version, optional
                 The MDS version to target. By default, use Version.mds_lower().
+
+            route_points: int, optional
+                The number of waypoints in each trip's route, including start and end. By default, 2.
+
+            route_jitter: numeric, optional
+                The standard deviation in meters of the waypoints' random offsets from a straight
+                line between start and end. By default, 10.
+
+            seed: int, optional
+                Seed for the random data, so that generation is reproducible. By default, unpredictable.
+
+            rng: numpy.random.Generator, optional
+                The source of randomness, instead of seed.
         """
-        self.boundary = mds.geometry.parse_boundary(boundary)
+        if isinstance(boundary, str):
+            boundary = mds.geometry.parse_boundary(boundary)
+        self.boundary = boundary
         self.version = Version(kwargs.pop("version", Version.mds_lower()))
-        self.trips_schema = Schema.trips(self.version)
-        self.speed = kwargs.get("speed", random.randint(4, 9))
 
-        self.vehicle_types = kwargs.get("vehicle_types", self.trips_schema.vehicle_types)
+        # the schema is only needed (and downloaded) for the default vehicle and propulsion types
+        self.trips_schema = None
+        if "vehicle_types" not in kwargs or "propulsion_types" not in kwargs:
+            self.trips_schema = Schema.trips(self.version)
+        self.rng = kwargs.get("rng") or np.random.default_rng(kwargs.get("seed"))
+        self.speed = kwargs.get("speed", int(self.rng.integers(4, 10)))
+        self.route_points = kwargs.get("route_points", 2)
+        self.route_jitter = kwargs.get("route_jitter", 10)
+
+        self.vehicle_types = kwargs["vehicle_types"] if "vehicle_types" in kwargs else self.trips_schema.vehicle_types
         if isinstance(self.vehicle_types, str):
             self.vehicle_types = self.vehicle_types.split(",")
 
-        self.propulsion_types = kwargs.get("propulsion_types", self.trips_schema.propulsion_types)
+        self.propulsion_types = kwargs["propulsion_types"] if "propulsion_types" in kwargs else self.trips_schema.propulsion_types
         if isinstance(self.propulsion_types, str):
             self.propulsion_types = self.propulsion_types.split(",")
 
@@ -84,15 +120,15 @@ class ProviderDataGenerator():
                 A list of dict each representing a device for the provider.
         """
         devices = []
-        provider_id = provider_id or uuid.uuid4()
+        provider_id = provider_id or util.random_uuid(self.rng)
 
         for _ in range(N):
             device = dict(provider_id=provider_id,
                           provider_name=provider_name,
-                          device_id=uuid.uuid4(),
-                          vehicle_id=util.random_string(6),
-                          vehicle_type=random.choice(self.vehicle_types),
-                          propulsion_type=[random.choice(self.propulsion_types)])
+                          device_id=util.random_uuid(self.rng),
+                          vehicle_id=util.random_string(6, rng=self.rng),
+                          vehicle_type=self.vehicle_types[self.rng.integers(len(self.vehicle_types))],
+                          propulsion_type=[self.propulsion_types[self.rng.integers(len(self.propulsion_types))]])
 
             # ensure electric devices are charged
             if self.has_battery(device):
@@ -127,63 +163,75 @@ class ProviderDataGenerator():
             tuple (status_changes: list, trips: list)
         """
         day_status_changes, day_trips = [], []
+
+        for status_changes, trips in self.service_hours(devices, date, hour_open, hour_closed, inactivity):
+            day_status_changes.extend(status_changes)
+            day_trips.extend(trips)
+
+        return day_status_changes, day_trips
+
+    def service_hours(self, devices, date, hour_open, hour_closed, inactivity):
+        """
+        Create status_change events and trips for a day of service, one hour at a time.
+
+        Only the fleet's state is kept between hours, so a day of service can be streamed
+        (e.g. with mds.files.PayloadWriter) without holding all of its records in memory.
+
+        Parameters:
+            See service_day().
+
+        Returns:
+            generator of tuple (status_changes: list, trips: list)
+                The service start events (and the inactive devices' service end events), then
+                the events and trips of each hour of service, then the service end events.
+        """
         start_time = date.replace(hour=hour_open)
         end_time = date.replace(hour=hour_closed)
+        fleet = Fleet(devices)
 
         # partition the devices into inactive and active
         # inactive will only get start/end service events in the same location
-        inactive_devices = random.sample(devices, int(len(devices)*inactivity))
+        inactive = np.zeros(len(fleet), dtype=bool)
+        inactive[self.rng.choice(len(fleet), int(len(fleet)*inactivity), replace=False)] = True
+        inactive_devices = fleet.at(np.flatnonzero(inactive))
         inactive_starts = self.start_service(inactive_devices, start_time)
         inactive_locations = [e[EVENT_LOC] for e in inactive_starts]
         inactive_ends = self.end_service(inactive_devices, end_time, inactive_locations)
-        day_status_changes.extend(inactive_starts + inactive_ends)
 
         # all the rest of the devices that participate in the service day
-        active_devices = [d for d in devices if d not in inactive_devices]
-        start_events = self.start_service(active_devices, start_time)
-        day_status_changes.extend(start_events)
-
-        # the list of event_time from the prior event for each device
-        # initialized to the beginning of the day
-        times = [start_time for e in start_events]
-        # the list of event_location from the prior event for each device
-        locations = [e[EVENT_LOC] for e in start_events]
-        # devices removed from service during a given hour
-        removed_devices = []
+        active = np.flatnonzero(~inactive)
+        start_events = self.start_service(fleet.at(active), start_time)
+
+        # the prior event for each device, initialized to the beginning of the day
+        fleet.activate(active)
+        fleet.update(active, times=[start_time] * len(active), locations=[e[EVENT_LOC] for e in start_events])
+
+        yield inactive_starts + inactive_ends + start_events, []
 
         # model each hour of the day (including the last)
         for hour in range(hour_open, hour_closed + 1):
+            hour_status_changes = []
+
             # some devices may be recharged and put back into service this hour
-            recharged = random.sample(removed_devices, random.randint(0, len(removed_devices)))
+            removed = fleet.removed_slots
+            recharged = np.sort(self.rng.choice(removed, self.rng.integers(0, len(removed) + 1), replace=False))
             if len(recharged) > 0:
+                # generate the placement events, after the devices were removed
+                events = self.devices_recharged(fleet.at(recharged), list(fleet.times[recharged]))
+                hour_status_changes.extend(events)
                 # re-activate these for the hour
-                active_devices.extend(recharged)
-                # generate the placement events
-                events = self.devices_recharged(recharged, [r[EVENT_TIME] for r in recharged])
-                day_status_changes.extend(events)
-                times.extend([e[EVENT_TIME] for e in events])
-                locations.extend([e[EVENT_LOC] for e in events])
-                # update the list of removed devices
-                removed_devices = [d for d in removed_devices if d not in recharged]
+                fleet.activate(recharged)
+                fleet.update(recharged, times=[e[EVENT_TIME] for e in events], locations=[e[EVENT_LOC] for e in events])
 
             # generate data for the hour
-            active_devices, times, locations, removed, hour_changes, hour_trips = \
-                self.service_hour(
-                    active_devices,
-                    date,
-                    hour,
-                    times,
-                    locations,
-                    inactivity
-                )
-            day_status_changes.extend(hour_changes)
-            day_trips.extend(hour_trips)
-            removed_devices.extend(removed)
+            hour_changes, hour_trips = self.fleet_hour(fleet, inactivity)
+            hour_status_changes.extend(hour_changes)
 
-        # end service for the remaining active devices
-        day_status_changes.extend(self.end_service(active_devices, end_time, locations))
+            yield hour_status_changes, hour_trips
 
-        return day_status_changes, day_trips
+        # end service for the remaining active devices
+        active = fleet.active_slots
+        yield self.end_service(fleet.at(active), end_time, list(fleet.locations[active])), []
 
     def service_hour(self, devices, date, hour, times, locations, inactivity):
         """
@@ -209,52 +257,118 @@ class ProviderDataGenerator():
                    status_changes: list,
                    trips: list)
         """
-        active, removed, changes, trips = [], [], [], []
+        fleet = Fleet(devices, times, locations)
+        fleet.activate(np.arange(len(fleet)))
+
+        changes, trips = self.fleet_hour(fleet, inactivity)
+
+        active, removed = fleet.active_slots, fleet.removed_slots
+        removed_devices = [{**fleet.devices[r], EVENT_TIME: fleet.times[r]} for r in removed]
+
+        # return all the data for this hour
+        return (fleet.at(active),
+                list(fleet.times[active]),
+                list(fleet.locations[active]),
+                removed_devices,
+                changes,
+                trips)
+
+    def fleet_hour(self, fleet, inactivity):
+        """
+        Create status_change events and trips for an hour of service of the active devices in fleet,
+        updating the fleet's state.
+
+        Parameters:
+            fleet: Fleet
+                The state of the fleet at the start of the hour.
 
-        # chance of taking or not taking a trip
-        weights = [1 - inactivity, inactivity]
-        for device_idx in range(0, len(devices)):
-            # assume this device will be active this hour
-            device = devices[device_idx]
-            active.append(device)
-            location = locations[device_idx]
-            current_time = times[device_idx]
+            inactivity: float
+                A measure of how inactive the fleet is during this hour
+
+        Returns:
+            tuple (status_changes: list, trips: list)
+        """
+        changes, trips = [], []
+        slots = fleet.active_slots
+        devices = fleet.at(slots)
+        draws = self.hour_draws(devices, inactivity)
+
+        # the destinations of this hour's trips, computed all at once
+        trip_idx = np.flatnonzero(draws["trip"])
+        starts = [mds.geometry.extract_point(fleet.locations[slot]) for slot in slots[trip_idx]]
+        distances = self.trip_distance(draws["trip_duration"][trip_idx])
+        destinations = geometry.points_nearby(starts, distances, boundary=self.boundary, rng=self.rng)
+        destinations = dict(zip(trip_idx, destinations))
+
+        for i, (slot, device) in enumerate(zip(slots, devices)):
+            location = fleet.locations[slot]
+            current_time = fleet.times[slot]
 
             # check the device's charge level
-            if self.has_battery(device) and device[BATTERY] < 0.2:
+            if draws["low_battery"][i]:
                 # battery is too low -> deactivate
                 lowbattery = self.device_lowbattery(device, current_time, location)
-                # update the state for this event and device
-                del active[active.index(device)]
-                rmvd = dict(device)
-                rmvd.update(event_time=lowbattery[EVENT_TIME])
-                removed.append(rmvd)
+                fleet.deactivate(slot)
+                fleet.update(slot, times=[lowbattery[EVENT_TIME]])
                 changes.append(lowbattery)
                 continue
 
             # will this device take a trip?
-            if random.choices([True, False], weights=weights, k=1)[0]:
+            if draws["trip"][i]:
                 # yes, it will -- sometime this hour
+                event_time = current_time + datetime.timedelta(seconds=draws["offset"][i])
+                end_time = event_time + datetime.timedelta(seconds=draws["trip_duration"][i])
+                end_location = geometry.feature(destinations[i], timestamp=end_time)
                 status, trip = self.device_trip(device,
+                                                event_time=event_time,
                                                 event_location=location,
-                                                reference_time=current_time,
-                                                max_td=self.TD_HOUR)
+                                                end_location=end_location,
+                                                trip_duration=draws["trip_duration"][i],
+                                                accuracy=draws["accuracy"][i])
                 changes.extend(status)
                 trips.append(trip)
                 # update the device's time and location from the trip's end event
-                times[device_idx] = status[-1][EVENT_TIME]
-                locations[device_idx] = status[-1][EVENT_LOC]
+                fleet.update(slot, times=[status[-1][EVENT_TIME]], locations=[status[-1][EVENT_LOC]])
             elif self.has_battery(device):
                 # no, it won't take a trip -- leak some power anyway
-                self.drain_battery(device, rate=random.uniform(0, 0.05))
+                self.drain_battery(device, rate=draws["leak"][i])
 
-        # return all the data for this hour
-        return (active,
-                [times[devices.index(a)] for a in active],
-                [locations[devices.index(a)] for a in active],
-                removed,
-                changes,
-                trips)
+        return changes, trips
+
+    def hour_draws(self, devices, inactivity):
+        """
+        Draw the random quantities for an hour of service for the whole fleet at once.
+
+        Parameters:
+            devices: list
+                The list of devices in service this hour.
+
+            inactivity: float
+                A measure of how inactive the fleet is during this hour.
+
+        Returns:
+            dict
+                Arrays indexable by devices:
+
+                * low_battery: True when the device's battery is too low for service
+                * trip: True when the device takes a trip this hour
+                * offset: seconds from the device's last event until its trip starts
+                * trip_duration: the trip's duration in seconds
+                * accuracy: the trip's accuracy in meters
+                * leak: the rate of battery drain for a device that doesn't take a trip
+        """
+        N = len(devices)
+        battery = np.array([d.get(BATTERY, 1.0) if self.has_battery(d) else 1.0 for d in devices], dtype=float)
+        low_battery = battery < 0.2
+
+        return dict(
+            low_battery=low_battery,
+            trip=~low_battery & (self.rng.random(N) < 1 - inactivity),
+            offset=self.rng.uniform(0, self.TD_HOUR.total_seconds(), N),
+            trip_duration=self.rng.gamma(self.TRIP_DURATION_SHAPE, self.TRIP_DURATION_SCALE, N) * 60,
+            accuracy=self.rng.rayleigh(self.ACCURACY_SCALE, N),
+            leak=self.rng.uniform(0, 0.05, N)
+        )
 
     def start_service(self, devices, start_time):
         """
@@ -276,11 +390,11 @@ class ProviderDataGenerator():
         # device placement starts before operation open time
         # -7200 seconds == previous 2 hours from start
         offset = datetime.timedelta(seconds=-7200)
-        for device in devices:
+        points = geometry.points_within(self.boundary, len(devices), rng=self.rng)
+        for device, point in zip(devices, points):
             # somewhere in the previous :offset:
-            event_time = util.random_date_from(start_time, min_td=offset)
-            point = geometry.point_within(self.boundary)
-            feature = mds.geometry.to_feature(point, properties=dict(timestamp=event_time))
+            event_time = util.random_date_from(start_time, min_td=offset, rng=self.rng)
+            feature = geometry.feature(point, timestamp=event_time)
 
             # the status_change details
             service_start = \
@@ -295,7 +409,7 @@ class ProviderDataGenerator():
                 self.recharge_battery(device)
 
             # combine with device details and append
-            status_changes.append({**device, **service_start})
+            status_changes.append(service_start)
 
         return status_changes
 
@@ -322,19 +436,22 @@ class ProviderDataGenerator():
         # device pickup likely doesn't happen right at close time
         # +7200 seconds == next 2 hours after close
         offset = datetime.timedelta(seconds=7200)
-        for device in devices:
+        if locations is None:
+            points = geometry.points_within(self.boundary, len(devices), rng=self.rng)
+
+        for device_idx, device in enumerate(devices):
             # somewhere in the next :offset:
-            event_time = util.random_date_from(end_time, max_td=offset)
+            event_time = util.random_date_from(end_time, max_td=offset, rng=self.rng)
 
             # use the device's index for the locations if provided
             # otherwise generate a random event_location
             if locations is None:
-                point = geometry.point_within(self.boundary)
+                point = points[device_idx]
             else:
-                point = mds.geometry.extract_point(locations[devices.index(device)])
+                point = mds.geometry.extract_point(locations[device_idx])
 
             # the status_change details
-            feature = mds.geometry.to_feature(point, properties=dict(timestamp=event_time))
+            feature = geometry.feature(point, timestamp=event_time)
             service_end = \
                 self.status_change_event(device,
                                          event_type="removed",
@@ -343,13 +460,13 @@ class ProviderDataGenerator():
                                          event_location=feature)
 
             # combine with device details and append
-            status_changes.append({**device, **service_end})
+            status_changes.append(service_end)
 
         return status_changes
 
     def device_trip(self, device, event_time=None, event_location=None,
                     end_location=None, reference_time=None, min_td=datetime.timedelta(seconds=0),
-                    max_td=datetime.timedelta(seconds=0), speed=None):
+                    max_td=datetime.timedelta(seconds=0), speed=None, trip_duration=None, accuracy=None):
         """
         Create a trip and associated status_changes for a device.
 
@@ -378,31 +495,40 @@ class ProviderDataGenerator():
             speed: int, optional
                 The average speed of the device in meters/second.
 
+            trip_duration: float, optional
+                The duration of the trip in seconds. By default, a random gamma distributed duration.
+
+            accuracy: float, optional
+                The accuracy of the trip in meters. By default, a random Rayleigh distributed accuracy.
+
         Returns:
-            tuple (status_changes: list, trip: dict)
+            tuple (status_changes: list, trip: Trip)
+                The StatusChange and Trip records are dict-like, see mds.fake.records.
         """
         if event_time is None and reference_time is None:
             reference_time = datetime.datetime.utcnow()
 
         if (event_time is None) and (reference_time is not None):
-            event_time = util.random_date_from(reference_time, min_td=min_td, max_td=max_td)
+            event_time = util.random_date_from(reference_time, min_td=min_td, max_td=max_td, rng=self.rng)
 
         if event_location is None:
-            point = geometry.point_within(self.boundary)
-            event_location = mds.geometry.to_feature(point, properties=dict(timestamp=event_time))
+            point = geometry.point_within(self.boundary, rng=self.rng)
+            event_location = geometry.feature(point, timestamp=event_time)
 
         if speed is None:
             speed = self.speed
 
         # Generate the trip_id to fill the associated_trip key in the status changes
-        trip_id = uuid.uuid4()
+        trip_id = util.random_uuid(self.rng)
         status_changes_kwargs = {}
-        if self.version >= Version("0.3.0"):
+        if self.version >= _V030:
             status_changes_kwargs["associated_trip"] = trip_id
         else:
             status_changes_kwargs["associated_trips"] = [trip_id]
 
-        # begin the trip
+        # begin the trip, before draining the battery: like every StatusChange, the event
+        # captures the device's battery_pct when it is created, so start_trip has the charge
+        # at the start of the trip and end_trip (below) the charge left at the end
         status_changes = [self.start_trip(device,
                                           event_time,
                                           event_location,
@@ -412,14 +538,14 @@ class ProviderDataGenerator():
         # the gamma distribution is referenced in the literature,
         # see: https://static.tti.tamu.edu/tti.tamu.edu/documents/17-1.pdf
         # experimenting with the scale factors led to these parameterizations, * 60 to get seconds
-        alpha, beta = 3, 4.5
-        trip_duration = random.gammavariate(alpha, beta) * 60
+        if trip_duration is None:
+            trip_duration = self.rng.gamma(self.TRIP_DURATION_SHAPE, self.TRIP_DURATION_SCALE) * 60
 
-        # account for traffic, turns, etc.
-        trip_distance = trip_duration * speed * 0.8
+        trip_distance = self.trip_distance(trip_duration, speed)
 
         # Model the accuracy as a rayleigh distribution with median ~5m
-        accuracy = scipy.stats.rayleigh.rvs(scale=5)
+        if accuracy is None:
+            accuracy = self.rng.rayleigh(self.ACCURACY_SCALE)
 
         # drain the battery according to the speed and distance traveled
         if self.has_battery(device):
@@ -431,41 +557,40 @@ class ProviderDataGenerator():
         end_time = event_time + datetime.timedelta(seconds=trip_duration)
         if end_location is None:
             start_point = mds.geometry.extract_point(event_location)
-            end_point = geometry.point_nearby(start_point, trip_distance, boundary=self.boundary)
-            end_location = mds.geometry.to_feature(end_point, properties=dict(timestamp=end_time))
+            end_point = geometry.point_nearby(start_point, trip_distance, boundary=self.boundary, rng=self.rng)
+            end_location = geometry.feature(end_point, timestamp=end_time)
 
         # generate the route object
-        route = self.trip_route(event_location, end_location)
+        route = self.trip_route(event_location, end_location, event_time, end_time)
 
         # and finally the trip object
-        trip = dict(
-            accuracy=int(accuracy),
-            trip_id=trip_id,
-            trip_duration=int(trip_duration),
-            trip_distance=int(trip_distance),
-            route=route,
-            start_time=event_time,
-            end_time=end_time
-        )
-
-        if self.version >= Version("0.3.0"):
-            trip[PUBLICATION_TIME] = end_time
+        trip = Trip(device,
+                    accuracy=int(accuracy),
+                    trip_id=trip_id,
+                    trip_duration=int(trip_duration),
+                    trip_distance=int(trip_distance),
+                    route=route,
+                    start_time=event_time,
+                    end_time=end_time)
+
+        if self.version >= _V030:
+            trip.publication_time = end_time
 
         # add a parking_verification_url?
-        if random.choice([True, False]):
-            trip.update(parking_verification_url=util.random_file_url(device["provider_name"]))
+        if self.rng.random() < 0.5:
+            trip.parking_verification_url = util.random_file_url(device["provider_name"], rng=self.rng)
 
         # add a standard_cost?
-        if random.choice([True, False]):
+        if self.rng.random() < 0.5:
             # $1.00 to start and $0.15 a minute thereafter
-            trip.update(standard_cost=(100 + (math.floor(trip_duration/60) - 1) * 15))
+            trip.standard_cost = 100 + (math.floor(trip_duration/60) - 1) * 15
 
         # add an actual cost?
-        if random.choice([True, False]):
+        if self.rng.random() < 0.5:
             # randomize an actual_cost
             # $0.75 - $1.50 to start, and $0.12 - $0.20 a minute thereafter...
-            start, rate = random.randint(75, 150), random.randint(12, 20)
-            trip.update(actual_cost=(start + (math.floor(trip_duration/60) - 1) * rate))
+            start, rate = int(self.rng.integers(75, 151)), int(self.rng.integers(12, 21))
+            trip.actual_cost = start + (math.floor(trip_duration/60) - 1) * rate
 
         # end the trip
         status_changes.append(self.end_trip(device,
@@ -473,17 +598,8 @@ class ProviderDataGenerator():
                                             end_location,
                                             **status_changes_kwargs))
 
-        # merge the device info into the trip
-        trip = {**device, **trip}
-
-        # cleanup leftover fields not part of a trip
-        if BATTERY in trip:
-            del trip[BATTERY]
-        if EVENT_TIME in trip:
-            del trip[EVENT_TIME]
-
         # return a list of the status_changes and the trip
-        return [{**device, **sc} for sc in status_changes], trip
+        return status_changes, trip
 
     def start_trip(self, device, event_time, event_location, **kwargs):
         """
@@ -512,10 +628,13 @@ class ProviderDataGenerator():
             **kwargs
         )
 
-    def trip_route(self, start_location, end_location):
+    def trip_route(self, start_location, end_location, start_time=None, end_time=None):
         """
         Create GeoJSON FeatureCollection for the trip's route.
 
+        With route_points > 2, waypoints are added between the start and end locations
+        (see geometry.waypoints()), timestamped as if traveling the route at a constant speed.
+
         Parameters:
             start_location: GeoJSON Feature
                 The location the trip should start.
@@ -523,11 +642,37 @@ class ProviderDataGenerator():
             end_location: GeoJSON Feature
                 The location the trip should end.
 
+            start_time: datetime, optional
+                The time the trip starts. By default, the timestamp of start_location.
+
+            end_time: datetime, optional
+                The time the trip ends. By default, the timestamp of end_location.
+
         Returns:
             dict
-                A GeoJSON FeatureCollection of the start and end locations.
+                A GeoJSON FeatureCollection of the start, waypoint and end locations.
         """
-        features = [start_location, end_location]
+        if self.route_points <= 2:
+            features = [start_location, end_location]
+            return dict(type="FeatureCollection", features=features)
+
+        start_time = start_time or start_location["properties"]["timestamp"]
+        end_time = end_time or end_location["properties"]["timestamp"]
+        duration = (end_time - start_time).total_seconds()
+
+        start = mds.geometry.extract_point(start_location)
+        end = mds.geometry.extract_point(end_location)
+        x, y, progress = geometry.waypoints(start, end, self.route_points, self.route_jitter, self.rng)
+
+        # build the waypoint Features directly, routes may have hundreds of them
+        waypoints = [
+            dict(type="Feature",
+                 properties=dict(timestamp=start_time + datetime.timedelta(seconds=p)),
+                 geometry=dict(type="Point", coordinates=[px, py]))
+            for px, py, p in zip(x[1:-1].tolist(), y[1:-1].tolist(), (progress[1:-1] * duration).tolist())
+        ]
+
+        features = [start_location, *waypoints, end_location]
         return dict(type="FeatureCollection", features=features)
 
     def end_trip(self, device, event_time, event_location, **kwargs):
@@ -606,23 +751,25 @@ class ProviderDataGenerator():
         """
         status_changes = []
 
-        for device in devices:
+        if event_locations is None:
+            points = geometry.points_within(self.boundary, len(devices), rng=self.rng)
+
+        for device_idx, device in enumerate(devices):
             if isinstance(event_times, datetime.datetime):
                 # how many seconds until the next hour?
                 diff = (60 - event_times.minute - 1)*60 + (60 - event_times.second)
                 # random datetime between event_times and then
-                event_time = util.random_date_from(event_times, max_td=datetime.timedelta(seconds=diff))
+                event_time = util.random_date_from(event_times, max_td=datetime.timedelta(seconds=diff), rng=self.rng)
             elif len(event_times) == len(devices):
                 # corresponding datetime
-                event_time = event_times[devices.index(device)]
+                event_time = event_times[device_idx]
 
             if event_locations is None:
                 # random point
-                point = geometry.point_within(self.boundary)
-                event_location = mds.geometry.to_feature(point, properties=dict(timestamp=event_time))
+                event_location = geometry.feature(points[device_idx], timestamp=event_time)
             elif len(event_locations) == len(devices):
                 # corresponding location
-                event_location = event_locations[devices.index(device)]
+                event_location = event_locations[device_idx]
             else:
                 # given location
                 event_location = event_locations
@@ -690,18 +837,27 @@ class ProviderDataGenerator():
             Additional keyword parameters are passed into the event as attributes.
 
         Returns:
-            dict
-                A dict representation of the status_change data.
+            StatusChange
+                A compact, dict-like representation of the status_change data, sharing the device's
+                fields. See mds.fake.records.
         """
-        status_change = dict(event_type=event_type,
-                             event_type_reason=event_type_reason,
-                             event_time=event_time,
-                             event_location=event_location)
+        publication_time = event_time if self.version >= _V030 else None
 
-        if self.version >= Version("0.3.0"):
-            status_change[PUBLICATION_TIME] = event_time
+        return StatusChange(device,
+                            event_type=event_type,
+                            event_type_reason=event_type_reason,
+                            event_time=event_time,
+                            event_location=event_location,
+                            publication_time=publication_time,
+                            extra=kwargs)
 
-        return {**device, **status_change, **kwargs}
+    def trip_distance(self, trip_duration, speed=None):
+        """
+        Estimate the distance in meters of trip(s) of trip_duration seconds at speed (by default, self.speed).
+        """
+        speed = self.speed if speed is None else speed
+        # account for traffic, turns, etc.
+        return trip_duration * speed * 0.8
 
     def has_battery(self, device):
         """
@@ -738,3 +894,154 @@ class ProviderDataGenerator():
             payload["data"] = dict(trips=trips)
 
         return payload
+
+
+def generate(boundary, providers, start, end, devices_per_provider, workers=None, **kwargs):
+    """
+    Generate fake MDS Provider data for many providers over many days, in parallel.
+
+    The work is split into shards of (provider, day), generated by a pool of worker processes.
+    Each provider's devices are created once, so the same fleet is in service every day. Each
+    shard is seeded from seed, the provider and the day, so shards don't depend on each other
+    or on the order they run in.
+
+    Only the devices' identity carries over from one day to the next: every shard starts from
+    the devices as created, and each day's service_start places them at new locations and
+    recharges them (see start_service()). Battery levels and locations at the end of a day are
+    not carried into the next.
+
+    The status_changes and trips payloads of each shard are written with DataFile.dump_payloads()
+    as soon as the shard finishes. With page_size, each shard instead streams its records hour by
+    hour into chains of paged payload files (see mds.files.PayloadWriter), so no shard holds
+    a whole day of data in memory.
+
+    Parameters:
+        boundary: str
+            The path to a geoJSON file with boundary geometry within which to generate data.
+
+        providers: list
+            The names (str) or Provider instances of the fictional providers.
+
+        start: date, datetime
+            The first day of service.
+
+        end: date, datetime
+            The last day of service.
+
+        devices_per_provider: int
+            The number of devices operated by each provider.
+
+        workers: int, optional
+            The maximum number of worker processes. By default, the number of processors.
+
+        hour_open: int, optional
+            The hour of the day that service begins. By default, 7.
+
+        hour_closed: int, optional
+            The hour of the day that service ends. By default, 19.
+
+        inactivity: float, optional
+            The percent of devices that are inactive for the day. By default, 0.05.
+
+        output_dir: str, Path, optional
+            The directory to write payload files. By default, the current directory.
+
+        seed: int, optional
+            Seed for the random data of every shard. By default, unpredictable.
+
+        page_size: int, optional
+            Stream each shard into paged payload files of at most page_size records.
+            By default, write a single payload file per shard and record_type.
+
+        Additional keyword arguments are passed-through to ProviderDataGenerator().
+
+    Return:
+        list
+            The Path of each file written.
+    """
+    hour_open = kwargs.pop("hour_open", 7)
+    hour_closed = kwargs.pop("hour_closed", 19)
+    inactivity = kwargs.pop("inactivity", 0.05)
+    output_dir = kwargs.pop("output_dir", ".")
+    seed = kwargs.pop("seed", None)
+    page_size = kwargs.pop("page_size", None)
+
+    seeds = np.random.SeedSequence(seed)
+    generator = ProviderDataGenerator(boundary, rng=np.random.default_rng(seeds), **kwargs)
+
+    days = [start + datetime.timedelta(days=d) for d in range((end - start).days + 1)]
+    days = [datetime.datetime(d.year, d.month, d.day) for d in days]
+
+    shards = []
+    for provider_idx, provider in enumerate(providers):
+        if isinstance(provider, Provider):
+            devices = generator.devices(devices_per_provider, provider.provider_name, provider.provider_id)
+        else:
+            devices = generator.devices(devices_per_provider, provider)
+
+        for day in days:
+            shard_seeds = np.random.SeedSequence(seeds.entropy, spawn_key=(provider_idx, day.toordinal()))
+            shards.append((devices, day, hour_open, hour_closed, inactivity, shard_seeds, output_dir, page_size))
+
+    files = []
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(generator,)) as executor:
+        futures = [executor.submit(_generate_shard, shard) for shard in shards]
+
+        for future in concurrent.futures.as_completed(futures):
+            if page_size:
+                files.extend(future.result())
+                continue
+
+            status_changes, trips = future.result()
+
+            if len(status_changes) > 0:
+                payload = generator.make_payload(status_changes=status_changes)
+                files.append(DataFile(STATUS_CHANGES).dump_payloads(payload, output_dir=output_dir))
+
+            if len(trips) > 0:
+                payload = generator.make_payload(trips=trips)
+                files.append(DataFile(TRIPS).dump_payloads(payload, output_dir=output_dir))
+
+    return files
+
+
+_worker_generator = None
+
+
+def _init_worker(generator):
+    """
+    Keep a ProviderDataGenerator for the shards run by this worker process.
+    """
+    global _worker_generator
+    _worker_generator = generator
+
+
+def _generate_shard(shard):
+    """
+    Generate a day of service for a provider's devices, seeded for this shard.
+
+    devices arrive as created by generate() (a copy, in the worker process), so the day starts
+    from their initial state rather than the end of the previous day.
+
+    With page_size, stream the day into paged payload files and return their paths.
+    """
+    devices, day, hour_open, hour_closed, inactivity, seeds, output_dir, page_size = shard
+
+    generator = _worker_generator
+    generator.rng = np.random.default_rng(seeds)
+
+    if not page_size:
+        return generator.service_day(devices, day, hour_open, hour_closed, inactivity)
+
+    prefix = f"{devices[0]['provider_name']}_{day.strftime('%Y%m%d')}" if devices else day.strftime('%Y%m%d')
+    writers = [
+        PayloadWriter(record_type, generator.version, output_dir, page_size, prefix=f"{prefix}_{record_type}")
+        for record_type in (STATUS_CHANGES, TRIPS)
+    ]
+
+    with writers[0] as status_changes_writer, writers[1] as trips_writer:
+        for status_changes, trips in generator.service_hours(devices, day, hour_open, hour_closed, inactivity):
+            status_changes_writer.write(status_changes)
+            trips_writer.write(trips)
+
+    return status_changes_writer.paths + trips_writer.paths
@@ -0,0 +1,144 @@
+"""
+Compact representations of generated MDS Provider records.
+"""
+
+import collections.abc
+
+
+BATTERY = "battery_pct"
+EVENT_TIME = "event_time"
+
+
+class Record(collections.abc.Mapping):
+    """
+    A read-only, dict-like MDS Provider record that shares its device's fields.
+
+    Records keep their own fields in slots and a reference to the (shared) device dict, rather
+    than a merged copy of both; the merged MDS dict is only built by to_dict(), e.g. when the
+    record is serialized with mds.encoding.JsonEncoder. Fields set to None are omitted.
+
+    Subclasses define FIELDS, the names of the record's own fields in MDS order.
+    """
+
+    __slots__ = ("device",)
+
+    FIELDS = ()
+
+    # device fields that are not part of the record
+    EXCLUDED = (EVENT_TIME,)
+
+    def __repr__(self):
+        return f"<mds.fake.records.{self.__class__.__name__} {self.to_dict()}>"
+
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        else:
+            value = self._device_field(key)
+            if value is not None:
+                return value
+
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.to_dict())
+
+    def __len__(self):
+        return len(self.to_dict())
+
+    def _device_field(self, key):
+        """
+        Get the value of a device field, or None when it is not part of the record.
+        """
+        if key in self.EXCLUDED:
+            return None
+        return self.device.get(key)
+
+    def to_dict(self):
+        """
+        Get the MDS dict representation of this record.
+        """
+        record = {}
+        for key in self.device:
+            value = self._device_field(key)
+            if value is not None:
+                record[key] = value
+
+        for field in self.FIELDS:
+            value = getattr(self, field)
+            if value is not None:
+                record[field] = value
+
+        return record
+
+
+class StatusChange(Record):
+    """
+    A status_change event. See ProviderDataGenerator.status_change_event().
+
+    The device's battery_pct is captured when the event is created, since the device dict
+    keeps changing afterwards.
+    """
+
+    __slots__ = ("battery_pct", "event_type", "event_type_reason", "event_time", "event_location",
+                 "publication_time", "extra")
+
+    FIELDS = ("event_type", "event_type_reason", "event_time", "event_location", "publication_time")
+
+    def __init__(self, device, event_type, event_type_reason, event_time, event_location,
+                 publication_time=None, extra=None):
+        self.device = device
+        self.battery_pct = device.get(BATTERY)
+        self.event_type = event_type
+        self.event_type_reason = event_type_reason
+        self.event_time = event_time
+        self.event_location = event_location
+        self.publication_time = publication_time
+        self.extra = extra or None
+
+    def __getitem__(self, key):
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        return Record.__getitem__(self, key)
+
+    def _device_field(self, key):
+        if key == BATTERY:
+            return self.battery_pct
+        return Record._device_field(self, key)
+
+    def to_dict(self):
+        record = Record.to_dict(self)
+        if self.extra:
+            record.update(self.extra)
+        return record
+
+
+class Trip(Record):
+    """
+    A trip. See ProviderDataGenerator.device_trip().
+    """
+
+    __slots__ = ("accuracy", "trip_id", "trip_duration", "trip_distance", "route", "start_time", "end_time",
+                 "publication_time", "parking_verification_url", "standard_cost", "actual_cost")
+
+    FIELDS = ("accuracy", "trip_id", "trip_duration", "trip_distance", "route", "start_time", "end_time",
+              "publication_time", "parking_verification_url", "standard_cost", "actual_cost")
+
+    EXCLUDED = (BATTERY, EVENT_TIME)
+
+    def __init__(self, device, accuracy, trip_id, trip_duration, trip_distance, route, start_time, end_time,
+                 publication_time=None, parking_verification_url=None, standard_cost=None, actual_cost=None):
+        self.device = device
+        self.accuracy = accuracy
+        self.trip_id = trip_id
+        self.trip_duration = trip_duration
+        self.trip_distance = trip_distance
+        self.route = route
+        self.start_time = start_time
+        self.end_time = end_time
+        self.publication_time = publication_time
+        self.parking_verification_url = parking_verification_url
+        self.standard_cost = standard_cost
+        self.actual_cost = actual_cost
@@ -0,0 +1,442 @@
+"""
+Serve fake MDS Provider data over HTTP, for testing API clients locally.
+"""
+
+import collections
+import http.server
+import json
+import logging
+import math
+import threading
+import time
+import urllib.parse
+import uuid
+
+import numpy as np
+
+from ..encoding import JsonEncoder, TimestampEncoder
+from ..files import DataFile
+from ..providers import Provider
+from ..schemas import STATUS_CHANGES, TRIPS
+from ..versions import UnexpectedVersionError, Version
+
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPE = "application/vnd.mds.provider+json"
+
+TOKEN_PATHS = {
+    "oauth": "/oauth/token",
+    "bolt": "/bolt/token",
+    "spin": "/spin/token"
+}
+
+AUTH_TYPES = ["token", *TOKEN_PATHS.keys()]
+
+
+class ProviderServer():
+    """
+    A local HTTP server for MDS Provider data, e.g. generated with ProviderDataGenerator.
+
+    Serves the status_changes and trips endpoints with paging and the time range filters of the
+    server's MDS version, along with token endpoints for each auth type in mds.api.auth. Page size,
+    latency and a rate limit are configurable for repeatable throughput tests of mds.api.Client:
+
+        with ProviderServer(status_changes=status_changes, trips=trips, page_size=500) as server:
+            client = Client(server.provider(), version=server.version)
+            payloads = client.get_trips(min_end_time=start, max_end_time=end)
+
+    Records are sorted and encoded once, up front, so that serving a page costs little more than
+    a binary search and joining the page's JSON.
+    """
+
+    def __init__(self, status_changes=None, trips=None, **kwargs):
+        """
+        Initialize a new ProviderServer.
+
+        Parameters:
+            status_changes: list, optional
+                The status_changes records to serve.
+
+            trips: list, optional
+                The trips records to serve.
+
+            version: str, Version, optional
+                The MDS version of the records. By default, Version.mds_lower().
+
+            host: str, optional
+                The host to bind. By default, 127.0.0.1.
+
+            port: int, optional
+                The port to bind. By default, an unused port.
+
+            page_size: int, optional
+                The maximum number of records in each page. By default, 1000.
+
+            latency: float, optional
+                Seconds to wait before answering each request. By default, 0.
+
+            rate_limit: int, optional
+                The maximum number of data requests per second, after which requests receive
+                429 Too Many Requests with a Retry-After header. By default, unlimited.
+
+            token: str, optional
+                The token expected in the Authorization header, and issued by the token endpoints.
+                By default, a random token.
+
+            client_id, client_secret, email, password: str, optional
+                The credentials accepted by the token endpoints. By default, "fake".
+        """
+        self.version = Version(kwargs.pop("version", Version.mds_lower()))
+        self.page_size = kwargs.pop("page_size", 1000)
+        self.latency = kwargs.pop("latency", 0)
+        self.rate_limit = kwargs.pop("rate_limit", None)
+        self.token = kwargs.pop("token", uuid.uuid4().hex)
+        self.credentials = dict(
+            client_id=kwargs.pop("client_id", "fake"),
+            client_secret=kwargs.pop("client_secret", "fake"),
+            email=kwargs.pop("email", "fake"),
+            password=kwargs.pop("password", "fake")
+        )
+
+        if self.page_size < 1:
+            raise ValueError(f"page_size must be positive, got: {self.page_size}")
+
+        self._data = {
+            STATUS_CHANGES: _Records(STATUS_CHANGES, status_changes or [], self.version),
+            TRIPS: _Records(TRIPS, trips or [], self.version)
+        }
+        self._requests = collections.deque()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self.httpd = http.server.ThreadingHTTPServer((kwargs.pop("host", "127.0.0.1"), kwargs.pop("port", 0)), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.provider_server = self
+
+    def __repr__(self):
+        return f"<mds.fake.server.ProviderServer ('{self.version}', '{self.url}')>"
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    @classmethod
+    def from_files(cls, *sources, **kwargs):
+        """
+        Create a ProviderServer for the records in MDS payload files.
+
+        Parameters:
+            sources: str, Path, list
+                One or more paths to (directories containing) MDS payload (JSON) files.
+
+            Additional keyword arguments are passed-through to ProviderServer().
+
+        Return:
+            ProviderServer
+        """
+        records, versions = {}, []
+        for record_type in (STATUS_CHANGES, TRIPS):
+            loaded = DataFile(record_type, *sources).load_records()
+            if loaded:
+                version, records[record_type] = loaded
+                versions.append(version)
+
+        if versions and any(v != versions[0] for v in versions):
+            raise UnexpectedVersionError(versions[1], versions[0])
+        if versions:
+            kwargs.setdefault("version", versions[0])
+
+        return cls(records.get(STATUS_CHANGES), records.get(TRIPS), **kwargs)
+
+    @property
+    def url(self):
+        """
+        The base URL of the server.
+        """
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def provider(self, auth="token", **kwargs):
+        """
+        Create a Provider for this server, configured for one of its auth types.
+
+        Parameters:
+            auth: str, optional
+                One of AUTH_TYPES:
+
+                * token: a static Authorization token (AuthorizationToken, the default)
+                * oauth: the OAuth 2.0 client_credentials flow (OAuthClientCredentials)
+                * bolt: the Bolt token flow (BoltClientCredentials)
+                * spin: the Spin token flow (SpinClientCredentials)
+
+            Additional keyword arguments are set as attributes on the Provider.
+
+        Return:
+            Provider
+        """
+        if auth not in AUTH_TYPES:
+            raise ValueError(f"Invalid auth '{auth}'. Valid auth types: {', '.join(AUTH_TYPES)}")
+
+        config = dict(provider_name="fake", provider_id=uuid.uuid4(), mds_api_url=self.url)
+
+        if auth == "token":
+            config.update(token=self.token)
+        elif auth == "oauth":
+            config.update(token_url=self.url + TOKEN_PATHS[auth], scope="fake",
+                          client_id=self.credentials["client_id"], client_secret=self.credentials["client_secret"])
+        else:
+            # the Bolt and Spin flows are selected by provider_name
+            config.update(provider_name=auth, token_url=self.url + TOKEN_PATHS[auth],
+                          email=self.credentials["email"], password=self.credentials["password"])
+
+        return Provider(**{ **config, **kwargs })
+
+    def start(self):
+        """
+        Start serving requests in a background thread.
+
+        Return:
+            ProviderServer
+                This instance.
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+            self._thread.start()
+
+        return self
+
+    def stop(self):
+        """
+        Stop serving requests and close the server.
+        """
+        if self._thread is not None:
+            self.httpd.shutdown()
+            self._thread.join()
+            self._thread = None
+
+        self.httpd.server_close()
+
+    def serve(self):
+        """
+        Serve requests until interrupted, e.g. to run the server from a script.
+        """
+        logger.info("Serving MDS Provider %s data on %s", self.version, self.url)
+        try:
+            self.httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.httpd.server_close()
+
+    def _retry_after(self):
+        """
+        Count a data request against the rate limit.
+
+        Return:
+            int
+                Seconds until another request is allowed when the limit is exceeded, otherwise 0.
+        """
+        if not self.rate_limit:
+            return 0
+
+        with self._lock:
+            now = time.monotonic()
+            while self._requests and now - self._requests[0] >= 1:
+                self._requests.popleft()
+
+            if len(self._requests) >= self.rate_limit:
+                return max(1, math.ceil(1 - (now - self._requests[0])))
+
+            self._requests.append(now)
+            return 0
+
+    def _page(self, record_type, query):
+        """
+        Get the JSON str of the page of record_type data for the query parameters.
+        """
+        records = self._data[record_type]
+        selected = records.select(query)
+
+        page = int(query.get("page", 0))
+        start = page * self.page_size
+        end = start + self.page_size
+
+        links = dict(first=self._link(record_type, query, 0), next=None)
+        if end < len(selected):
+            links["next"] = self._link(record_type, query, page + 1)
+
+        data = ",".join([records.encoded[i] for i in selected[start:end]])
+
+        return "".join((
+            '{"version":', json.dumps(str(self.version)),
+            ',"data":{', json.dumps(record_type), ":[", data, "]}",
+            ',"links":', json.dumps(links),
+            "}"
+        ))
+
+    def _link(self, record_type, query, page):
+        """
+        Get the URL of page for the query parameters.
+        """
+        params = urllib.parse.urlencode({ **query, "page": page })
+        return f"{self.url}/{record_type}?{params}"
+
+
+class _Records():
+    """
+    The records of a record_type, pre-encoded and sorted for time range queries.
+    """
+
+    def __init__(self, record_type, records, version):
+        self.record_type = record_type
+        self.version = version
+
+        time_encoder = TimestampEncoder(date_format="unix", version=version)
+        timestamp = lambda t: float(time_encoder.encode(t)) if hasattr(t, "timestamp") else float(t)
+
+        # queries are ranges of event_time or end_time
+        sort_column = "event_time" if record_type == STATUS_CHANGES else "end_time"
+        sort_times = np.array([timestamp(r[sort_column]) for r in records], dtype=float)
+        order = np.argsort(sort_times, kind="stable")
+
+        self.times = sort_times[order]
+        self.start_times = None
+        if record_type == TRIPS and version < Version("0.3.0"):
+            self.start_times = np.array([timestamp(records[i]["start_time"]) for i in order], dtype=float)
+
+        self.device_ids = np.array([str(records[i].get("device_id")) for i in order], dtype=object)
+        self.vehicle_ids = np.array([str(records[i].get("vehicle_id")) for i in order], dtype=object)
+
+        encoder = JsonEncoder(date_format="unix", version=version)
+        self.encoded = [encoder.encode(records[i]) for i in order]
+
+    def __len__(self):
+        return len(self.encoded)
+
+    def select(self, query):
+        """
+        Get the (sorted) positions of the records matching the query parameters:
+
+        * status_changes: event_time in [start_time, end_time)
+        * trips, version < 0.3.0: start_time at or after start_time, end_time at or before end_time
+        * trips, version >= 0.3.0: end_time in [min_end_time, max_end_time)
+        * trips: device_id and vehicle_id
+        """
+        def param(name):
+            return float(query[name]) if query.get(name) not in (None, "") else None
+
+        lower, upper, upper_inclusive = None, None, False
+        if self.record_type == STATUS_CHANGES:
+            lower, upper = param("start_time"), param("end_time")
+        elif self.version < Version("0.3.0"):
+            upper, upper_inclusive = param("end_time"), True
+        else:
+            lower, upper = param("min_end_time"), param("max_end_time")
+
+        first = 0 if lower is None else np.searchsorted(self.times, lower, side="left")
+        last = len(self) if upper is None else np.searchsorted(self.times, upper, side="right" if upper_inclusive else "left")
+        selected = np.arange(first, max(first, last))
+
+        if self.record_type == TRIPS:
+            mask = np.ones(len(selected), dtype=bool)
+            if self.start_times is not None and param("start_time") is not None:
+                mask &= self.start_times[selected] >= param("start_time")
+            if query.get("device_id"):
+                mask &= self.device_ids[selected] == query["device_id"]
+            if query.get("vehicle_id"):
+                mask &= self.vehicle_ids[selected] == query["vehicle_id"]
+            selected = selected[mask]
+
+        return selected
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """
+    Handle requests to a ProviderServer.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # keep quiet, the server is meant for throughput tests
+        pass
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        record_type = url.path.strip("/").split("/")[-1]
+        server = self.server.provider_server
+
+        if record_type not in (STATUS_CHANGES, TRIPS):
+            return self._send(404, dict(error="not_found", error_description=f"No endpoint at {url.path}"))
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        retry_after = server._retry_after()
+        if retry_after:
+            return self._send(429, dict(error="rate_limited"), headers={ "Retry-After": str(retry_after) })
+
+        _, _, token = self.headers.get("Authorization", "").partition(" ")
+        if token != server.token:
+            return self._send(401, dict(error="unauthorized"))
+
+        accept = self.headers.get("Accept", "")
+        if accept.startswith(MEDIA_TYPE) and f"version={server.version.header}" not in accept:
+            return self._send(406, dict(error="unsupported_version", error_description=f"Version {server.version.header} is served"))
+
+        query = dict(urllib.parse.parse_qsl(url.query))
+        try:
+            body = server._page(record_type, query)
+        except ValueError as e:
+            return self._send(400, dict(error="bad_param", error_description=str(e)))
+
+        self._send(200, body, content_type=f"{MEDIA_TYPE};version={server.version.header}")
+
+    def do_POST(self):
+        url = urllib.parse.urlparse(self.path)
+        server = self.server.provider_server
+
+        if url.path not in TOKEN_PATHS.values():
+            return self._send(404, dict(error="not_found", error_description=f"No endpoint at {url.path}"))
+
+        if server.latency:
+            time.sleep(server.latency)
+
+        # credentials arrive as form data (OAuth) or in the query string (Bolt, Spin)
+        length = int(self.headers.get("Content-Length", 0))
+        form = urllib.parse.parse_qs(self.rfile.read(length).decode()) if length else {}
+        params = { **urllib.parse.parse_qs(url.query), **form }
+        params = dict([(k, v[0]) for k,v in params.items()])
+
+        credentials = server.credentials
+        if url.path == TOKEN_PATHS["oauth"]:
+            valid = params.get("grant_type") == "client_credentials" and \
+                    params.get("client_id") == credentials["client_id"] and \
+                    params.get("client_secret") == credentials["client_secret"]
+            body = dict(access_token=server.token, token_type="Bearer", expires_in=3600)
+        else:
+            valid = params.get("email") == credentials["email"] and \
+                    params.get("password") == credentials["password"]
+            body = dict(token=server.token) if url.path == TOKEN_PATHS["bolt"] else dict(jwt=server.token)
+
+        if not valid:
+            return self._send(401, dict(error="invalid_client"))
+
+        self._send(200, body)
+
+    def _send(self, status, body, content_type="application/json", headers=None):
+        """
+        Send a response with a JSON body (dict or str).
+        """
+        data = (body if isinstance(body, str) else json.dumps(body)).encode()
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for k,v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
@@ -3,13 +3,23 @@ Generating random data of miscellaneous types.
 """
 
 import datetime
-import random
 import string
+import uuid
+
+import numpy as np
+
+
+def default_rng(rng=None):
+    """
+    Get rng, or a new unpredictably seeded numpy.random.Generator when rng is None.
+    """
+    return np.random.default_rng() if rng is None else rng
 
 
 def random_date_from(date,
                      min_td=datetime.timedelta(seconds=0),
-                     max_td=datetime.timedelta(seconds=0)):
+                     max_td=datetime.timedelta(seconds=0),
+                     rng=None):
     """
     Produces a datetime at a random offset from date.
 
@@ -23,17 +33,20 @@ def random_date_from(date,
         max_td: timedelta, optional
             The maximum offset from the reference datetime (could be negative).
 
+        rng: numpy.random.Generator, optional
+            The source of randomness. By default, unpredictable.
+
     Return:
         datetime
             A new_date such that (date + min_td) <= new_date < (date + max_td).
     """
     min_s = min(min_td.total_seconds(), max_td.total_seconds())
     max_s = max(min_td.total_seconds(), max_td.total_seconds())
-    offset = random.uniform(min_s, max_s)
+    offset = default_rng(rng).uniform(min_s, max_s)
     return date + datetime.timedelta(seconds=offset)
 
 
-def random_string(k, chars=None):
+def random_string(k, chars=None, rng=None):
     """
     Create a random string from the set of uppercase letters and numbers.
 
@@ -44,16 +57,19 @@ def random_string(k, chars=None):
         chars: iterable, optional
             The alphabet of characters from which to generate the string. By default, [A-Z0-9]
 
+        rng: numpy.random.Generator, optional
+            The source of randomness. By default, unpredictable.
+
     Return:
         str
             The generated string.
     """
     if chars is None:
-        chars = string.ascii_uppercase + string.digits 
-    return "".join(random.choices(chars, k=k))
+        chars = string.ascii_uppercase + string.digits
+    return "".join(default_rng(rng).choice(list(chars), size=k))
 
 
-def random_file_url(company):
+def random_file_url(company, rng=None):
     """
     Generate a random image url string.
 
@@ -61,9 +77,28 @@ def random_file_url(company):
         company: str
             The company name for the hostname.
 
+        rng: numpy.random.Generator, optional
+            The source of randomness. By default, unpredictable.
+
     Return:
         str
             A generated url for an image on the company's host.
     """
     url = "-".join(company.split())
-    return f"https://{url}.co/{random_string(7)}.jpg".lower()
+    return f"https://{url}.co/{random_string(7, rng=rng)}.jpg".lower()
+
+
+def random_uuid(rng=None):
+    """
+    Generate a random (version 4) UUID.
+
+    Parameters:
+        rng: numpy.random.Generator, optional
+            The source of randomness. By default, uuid.uuid4().
+
+    Return:
+        UUID
+    """
+    if rng is None:
+        return uuid.uuid4()
+    return uuid.UUID(bytes=rng.bytes(16), version=4)
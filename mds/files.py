@@ -637,3 +637,123 @@ class DataFile(BaseFile):
         files.extend([f for ls in [d.glob("*.json") for d in dirs] for f in ls])
 
         return files, urls
+
+
+class PayloadWriter():
+    """
+    Stream MDS Provider records into a chain of paged payload files.
+
+    Records are buffered until a page is full, and each page is written as its own payload file
+    with a links.next reference to the file of the following page, e.g.:
+
+        output_dir/prefix_000000.json -> output_dir/prefix_000001.json -> ...
+
+    The last page has links.next = null. Use as a context manager, or call close() when done.
+    """
+
+    def __init__(self, record_type, version, output_dir=".", page_size=1000, **kwargs):
+        """
+        Initialize a new PayloadWriter.
+
+        Parameters:
+            record_type: str
+                The type of MDS Provider record ("status_changes" or "trips").
+
+            version: str, Version
+                The MDS version of the payloads.
+
+            output_dir: str, Path, optional
+                The directory to write the files. By default, the current directory.
+
+            page_size: int, optional
+                The maximum number of records in each page. By default, 1000.
+
+            prefix: str, optional
+                The start of each page's file name. By default, record_type.
+
+            Additional keyword arguments are passed through to json.dump().
+        """
+        if record_type not in SCHEMA_TYPES:
+            raise ValueError(f"A valid record type must be specified. Got {record_type}")
+        if page_size < 1:
+            raise ValueError(f"page_size must be positive, got: {page_size}")
+
+        self.record_type = record_type
+        self.version = Version(version)
+        self.output_dir = pathlib.Path(output_dir)
+        self.page_size = page_size
+        self.prefix = kwargs.pop("prefix", record_type)
+        self.paths = []
+
+        self._encoder = JsonEncoder(date_format="unix", version=self.version, **kwargs)
+        self._buffer = []
+        self._closed = False
+
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+
+    def __repr__(self):
+        return f"<mds.files.PayloadWriter ('{self.record_type}', {len(self.paths)} pages)>"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, records):
+        """
+        Add records to the stream, writing any pages that are full.
+
+        A full page is only written once a record for the next page arrives, so that the last
+        page never links to an empty one.
+
+        Parameters:
+            records: list
+                The MDS Provider records to write.
+        """
+        if self._closed:
+            raise ValueError("Cannot write to a closed PayloadWriter.")
+
+        self._buffer.extend(records)
+
+        while len(self._buffer) > self.page_size:
+            self._write_page(self._buffer[:self.page_size], last=False)
+            del self._buffer[:self.page_size]
+
+    def close(self):
+        """
+        Write the remaining records as the last page.
+
+        Return:
+            list
+                The Path of each page written, in order.
+        """
+        if not self._closed:
+            # always write at least one (possibly empty) page
+            if self._buffer or not self.paths:
+                self._write_page(self._buffer, last=True)
+            self._buffer = []
+            self._closed = True
+
+        return self.paths
+
+    def _page_name(self, page):
+        """
+        Get the file name of page number page.
+        """
+        return f"{self.prefix}_{page:06d}.json"
+
+    def _write_page(self, records, last):
+        """
+        Write records as the next page.
+        """
+        page = len(self.paths)
+        payload = dict(
+            version=str(self.version),
+            data={ self.record_type: records },
+            links=dict(next=None if last else self._page_name(page + 1))
+        )
+
+        path = self.output_dir / self._page_name(page)
+        path.write_text(self._encoder.encode(payload))
+        self.paths.append(path)
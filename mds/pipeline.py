@@ -0,0 +1,168 @@
+"""
+Stream MDS Provider data from an API into a database.
+"""
+
+import queue
+import threading
+
+from .db.loaders import COUNTS
+from .schemas import DataValidator, STATUS_CHANGES, TRIPS
+
+
+_DONE = object()
+
+
+def sync(client, database, record_type, start_time=None, end_time=None, **kwargs):
+    """
+    Stream pages of MDS Provider data from an API into a database.
+
+    Pages are requested by a fetch thread and handed to the calling thread through a bounded queue,
+    where they are (optionally) validated and loaded in batches. Network and database work overlap,
+    and at most queue_size pages plus one batch are held in memory at a time.
+
+    Parameters:
+        client: mds.api.Client
+            The client used to request data.
+
+        database: mds.db.Database
+            The database to load data into.
+
+        record_type: str
+            The type of MDS data ("status_changes" or "trips").
+
+        start_time: datetime, int, optional
+            The beginning of the time window to request. See Client.get().
+
+        end_time: datetime, int, optional
+            The end of the time window to request. See Client.get().
+
+        provider: str, UUID, Provider, optional
+            Provider instance or identifier to request data from.
+            By default use the client's Provider instance.
+
+        params: dict, optional
+            Additional keyword arguments passed through to Client.stream(), e.g. paging or rate_limit.
+
+        validate: bool, DataValidator, optional
+            True to validate each page against the schema for record_type at the client's version;
+            or a DataValidator instance to validate with. Invalid pages are not loaded.
+            By default, False.
+
+        on_invalid: callable(page=dict, errors=list), optional
+            Callback executed for each invalid page with the list of its DataValidationError.
+
+        batch_size: int, optional
+            The number of records to accumulate from pages before loading. By default, 10000.
+
+        queue_size: int, optional
+            The maximum number of fetched pages waiting to be loaded. By default, 8.
+
+        Additional keyword arguments are passed-through to Database.load_status_changes() or
+        Database.load_trips().
+
+    Raise:
+        ValueError
+            When an invalid record_type is specified.
+
+    Return:
+        dict
+            Counts of the pages received, pages skipped as invalid, and records loaded; and of the
+            rows staged, inserted, updated and ignored by the database (see Database.last_load).
+    """
+    loaders = { STATUS_CHANGES: database.load_status_changes, TRIPS: database.load_trips }
+    if record_type not in loaders:
+        raise ValueError(f"Invalid record_type '{record_type}'.")
+
+    load = loaders[record_type]
+    provider = kwargs.pop("provider", None)
+    params = kwargs.pop("params", {})
+    validate = kwargs.pop("validate", False)
+    on_invalid = kwargs.pop("on_invalid", None)
+    batch_size = int(kwargs.pop("batch_size", 10000))
+    queue_size = int(kwargs.pop("queue_size", 8))
+
+    kwargs["batch_size"] = batch_size
+    kwargs["version"] = kwargs.get("version", client.version)
+
+    if validate is True:
+        validate = DataValidator(record_type, ref=client.version)
+
+    pages = client.stream(record_type, provider, start_time=start_time, end_time=end_time, **params)
+    fetched = queue.Queue(maxsize=queue_size)
+    stop = threading.Event()
+    errors = []
+
+    def _put(item):
+        """
+        Put item on the queue, waiting for room unless the loader has stopped.
+        """
+        while not stop.is_set():
+            try:
+                fetched.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _fetch():
+        """
+        Put pages on the queue until there are no more, or the loader has stopped.
+        """
+        try:
+            for page in pages:
+                _put(page)
+                if stop.is_set():
+                    return
+        except Exception as error:
+            errors.append(error)
+        finally:
+            _put(_DONE)
+
+    fetcher = threading.Thread(target=_fetch, name="mds-pipeline-fetch", daemon=True)
+    fetcher.start()
+
+    counts = dict(pages=0, invalid=0, records=0, **dict.fromkeys(COUNTS, 0))
+
+    def _load(batch, batch_records):
+        """
+        Load a batch of pages, adding to the counts.
+        """
+        load(batch, **kwargs)
+        counts["records"] += batch_records
+        for key, count in (database.last_load or {}).items():
+            counts[key] += count
+
+    batch, batch_records = [], 0
+
+    try:
+        while True:
+            page = fetched.get()
+            if page is _DONE:
+                break
+
+            counts["pages"] += 1
+
+            if validate:
+                invalid = list(validate.validate(page))
+                if len(invalid) > 0:
+                    counts["invalid"] += 1
+                    if on_invalid is not None:
+                        on_invalid(page, invalid)
+                    continue
+
+            batch.append(page)
+            batch_records += len(page["data"][record_type])
+
+            if batch_records >= batch_size:
+                _load(batch, batch_records)
+                batch, batch_records = [], 0
+
+        if len(errors) > 0:
+            raise errors[0]
+
+        if len(batch) > 0:
+            _load(batch, batch_records)
+    finally:
+        stop.set()
+        fetcher.join()
+
+    return counts
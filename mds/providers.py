@@ -105,7 +105,7 @@ class Provider():
         """
         if url:
             url = url.lower().rstrip("/")
-            return url if url.startswith("https://") else f"https://{url}"
+            return url if url.startswith(("https://", "http://")) else f"https://{url}"
         else:
             return None
 
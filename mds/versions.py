@@ -2,6 +2,7 @@
 Work with MDS versions.
 """
 
+import functools
 import sys
 
 import packaging.version
@@ -83,7 +84,10 @@ class Version():
             self._version = self._parse(f"{self.tuple[0]}.{self.tuple[1]}.{sys.maxsize}")
             self._legacy = (1, None)
 
-    def _parse(self, version):
+    @staticmethod
+    @functools.lru_cache(maxsize=None)
+    def _parse(version):
+        # parsed versions are immutable, and the same few versions are parsed over and over
         return packaging.version.parse(version)
 
     def __repr__(self):
@@ -22,15 +22,20 @@ setuptools.setup(
     install_requires=[
         "Fiona",
         "jsonschema",
+        "numpy",
         "packaging",
         "pandas",
         "psycopg2-binary",
         "python-dateutil",
         "requests",
-        "scipy",
         "Shapely",
         "sqlalchemy"
     ],
+    extras_require={
+        "arrow": ["pyarrow"],
+        "duckdb": ["duckdb", "duckdb_engine"],
+        "orjson": ["orjson"]
+    },
     classifiers=[
         "Intended Audience :: Developers",
         "License :: OSI Approved :: MIT License",
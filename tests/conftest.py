@@ -0,0 +1,70 @@
+import datetime
+import types
+
+import pytest
+import shapely.geometry
+
+from mds.db import Database, schema
+from mds.fake.provider import ProviderDataGenerator
+from mds.schemas import STATUS_CHANGES, TRIPS
+
+
+VERSION = "0.3.0"
+
+BOUNDARY = shapely.geometry.Polygon([(-118.5, 34.0), (-118.4, 34.0), (-118.4, 34.05), (-118.5, 34.05)])
+
+SERVICE_DAY = datetime.datetime(2019, 1, 1)
+
+
+def _generator():
+    # types are given so that the trips schema isn't downloaded
+    return ProviderDataGenerator(BOUNDARY, version=VERSION, seed=1, speed=6,
+                                 vehicle_types=["scooter"], propulsion_types=["electric"])
+
+
+@pytest.fixture
+def generator():
+    """
+    A seeded ProviderDataGenerator for VERSION, that works offline.
+    """
+    return _generator()
+
+
+@pytest.fixture(scope="session")
+def records():
+    """
+    A (status_changes, trips) day of service for 5 devices.
+    """
+    generator = _generator()
+    devices = generator.devices(5, "Provider")
+    return generator.service_day(devices, SERVICE_DAY, 7, 19, 0.2)
+
+
+@pytest.fixture(scope="session")
+def table_schema():
+    """
+    A stand-in for the (otherwise downloaded) Schema, with what schema.create_table() needs.
+    """
+    return types.SimpleNamespace(required_item_fields=[])
+
+
+@pytest.fixture
+def database(tmp_path, table_schema):
+    """
+    Get a factory of file-backed Database instances with status_changes and trips tables.
+    """
+    def _database(dialect="sqlite", **kwargs):
+        if dialect == "duckdb":
+            pytest.importorskip("duckdb_engine")
+            uri = f"duckdb:///{tmp_path / 'mds.duckdb'}"
+        else:
+            uri = f"sqlite:///{tmp_path / 'mds.db'}"
+
+        db = Database(uri=uri, version=VERSION, **kwargs)
+        with db.engine.begin() as conn:
+            for record_type in [STATUS_CHANGES, TRIPS]:
+                conn.execute(schema.create_table(record_type, schema=table_schema, version=VERSION, dialect=dialect))
+
+        return db
+
+    return _database
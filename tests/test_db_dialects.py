@@ -0,0 +1,85 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+
+@pytest.mark.parametrize("dialect", ["sqlite", "duckdb"])
+def test_load_read_round_trip(dialect, database, records):
+    status_changes, trips = records
+    db = database(dialect)
+
+    db.load_status_changes(status_changes)
+    db.load_trips(trips)
+
+    df = db.read_status_changes()
+    assert len(df) == len(status_changes)
+    assert set(df["device_id"].map(str)) == set(str(s["device_id"]) for s in status_changes)
+    assert pd.api.types.is_datetime64_any_dtype(df["event_time"])
+    assert pd.api.types.is_datetime64_any_dtype(df["publication_time"])
+
+    df = db.read_trips()
+    assert len(df) == len(trips)
+    assert set(df["trip_id"].map(str)) == set(str(t["trip_id"]) for t in trips)
+    assert pd.api.types.is_datetime64_any_dtype(df["start_time"])
+    assert pd.api.types.is_datetime64_any_dtype(df["end_time"])
+
+
+@pytest.mark.parametrize("dialect", ["sqlite", "duckdb"])
+def test_read_time_range(dialect, database, records):
+    status_changes, _ = records
+    db = database(dialect)
+    db.load_status_changes(status_changes)
+
+    start = datetime.datetime(2019, 1, 1, 12, tzinfo=datetime.timezone.utc)
+    df = db.read_status_changes(start_time=start)
+
+    assert 0 < len(df) < len(status_changes)
+    assert (df["event_time"] >= start.replace(tzinfo=None)).all()
+
+
+@pytest.mark.parametrize("dialect", ["sqlite", "duckdb"])
+def test_staging_keeps_permanent_table(dialect, database, records):
+    _, trips = records
+    db = database(dialect)
+    with db.engine.begin() as conn:
+        conn.execute('CREATE TABLE "trips_staging" (id integer)')
+        conn.execute('INSERT INTO "trips_staging" VALUES (1)')
+
+    db.load_trips(trips)
+
+    assert len(db.read_trips()) == len(trips)
+
+    # on a new connection, without the TEMP staging table shadowing the permanent one
+    db.engine.dispose()
+    with db.engine.connect() as conn:
+        assert conn.execute('SELECT count(*) FROM "trips_staging"').scalar() == 1
+
+
+def test_routes_toewkt_missing_routes():
+    from mds.db import Database
+
+    feature = lambda x, y: dict(type="Feature", geometry=dict(type="Point", coordinates=[x, y]))
+    route = dict(type="FeatureCollection", features=[feature(1, 2), feature(3, 4)])
+    df = pd.DataFrame({"route": [float("nan"), None, route]})
+
+    df = Database._routes_toewkt(df)
+
+    assert df["route"].tolist() == [None, None, "SRID=4326;LINESTRING(1 2,3 4)"]
+    assert df["start_location"].tolist() == [None, None, "SRID=4326;POINT(1 2)"]
+    assert df["end_location"].tolist() == [None, None, "SRID=4326;POINT(3 4)"]
+
+
+@pytest.mark.parametrize("chunksize", [None, 2])
+def test_read_copy_parses_timestamp_columns(chunksize, database, monkeypatch):
+    db = database()
+    csv = b"trip_id,start_time,end_time,sync_time\n1,2019-01-01 12:00:00,2019-01-01 12:10:00,not a time\n"
+    monkeypatch.setattr(db, "_copy_to", lambda query, params, file: file.write(csv))
+
+    df = db._read_copy("SELECT", {}, chunksize, parse_dates=["start_time", "end_time", "publication_time"])
+    if chunksize:
+        df = pd.concat(df)
+
+    assert pd.api.types.is_datetime64_any_dtype(df["start_time"])
+    assert pd.api.types.is_datetime64_any_dtype(df["end_time"])
+    assert df["sync_time"].tolist() == ["not a time"]
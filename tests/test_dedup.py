@@ -0,0 +1,124 @@
+import pandas as pd
+
+from mds.db.dedup import DedupIndex
+from mds.schemas import STATUS_CHANGES, TRIPS
+
+
+VERSION = "0.3.0"
+
+
+def trips(start=0, end=10):
+    return pd.DataFrame({
+        "provider_id": ["a5693267-5525-44e7-84a4-1534ecfd9380"] * (end - start),
+        "trip_id": [f"00000000-0000-0000-0000-{i:012d}" for i in range(start, end)],
+        "end_time": [1546344000000 + i * 60000 for i in range(start, end)]
+    })
+
+
+def test_filter_commit():
+    index = DedupIndex()
+
+    df, pending = index.filter(trips(), TRIPS, VERSION)
+    assert len(df) == 10
+
+    # not indexed until committed
+    assert len(index.filter(trips(), TRIPS, VERSION)[0]) == 10
+
+    index.commit(pending)
+    df, _ = index.filter(trips(5, 15), TRIPS, VERSION)
+    assert list(df["trip_id"]) == list(trips(10, 15)["trip_id"])
+
+
+def test_filter_duplicates_within_frame():
+    df, pending = DedupIndex().filter(pd.concat([trips(), trips()]), TRIPS, VERSION)
+    assert len(df) == 10
+    assert sum(len(hashes) for hashes in pending.values()) == 10
+
+
+def test_persistence(tmp_path):
+    index = DedupIndex(tmp_path)
+    index.commit(index.filter(trips(), TRIPS, VERSION)[1])
+
+    assert list(tmp_path.glob(f"{TRIPS}/*/*.bin"))
+
+    index = DedupIndex(tmp_path)
+    df, pending = index.filter(trips(5, 15), TRIPS, VERSION)
+    assert len(df) == 5
+    index.commit(pending)
+
+    index = DedupIndex(tmp_path)
+    assert len(index.filter(trips(0, 15), TRIPS, VERSION)[0]) == 0
+
+
+def test_database_commits_loaded_rows_only(tmp_path, database, records):
+    status_changes, _ = records
+    db = database(dedup=tmp_path / "dedup")
+
+    # the caller's before_load drops half of the records, which must not be indexed
+    db.load_status_changes(status_changes, before_load=lambda df, v: df.iloc[::2])
+    loaded = len(db.read_status_changes())
+    assert 0 < loaded < len(status_changes)
+
+    db.load_status_changes(status_changes)
+    assert len(db.read_status_changes()) == len(status_changes)
+    assert db.last_load["staged"] == len(status_changes) - loaded
+
+    # everything is indexed now, and nothing is staged again
+    db = database(dedup=tmp_path / "dedup")
+    db.load_status_changes(status_changes)
+    assert db.last_load["staged"] == 0
+
+
+def test_filter_missing_times():
+    status_changes = pd.DataFrame({
+        "provider_id": ["a5693267-5525-44e7-84a4-1534ecfd9380"] * 2,
+        "device_id": ["3a4c6954-0ad5-4273-a876-d6c94519b91f"] * 2,
+        "event_time": [1546344000000, None],
+        "event_type": ["available"] * 2,
+        "event_type_reason": ["service_start"] * 2
+    })
+
+    index = DedupIndex()
+    index.commit(index.filter(status_changes.iloc[:1], STATUS_CHANGES, VERSION)[1])
+
+    # a record's key doesn't depend on the other records in the batch
+    df, pending = index.filter(status_changes, STATUS_CHANGES, VERSION)
+    assert len(df) == 1 and df["event_time"].isna().all()
+
+    index.commit(pending)
+    assert len(index.filter(status_changes, STATUS_CHANGES, VERSION)[0]) == 0
+
+
+def test_database_commits_with_connection(tmp_path, database, records):
+    _, trips = records
+    db = database(dedup=tmp_path / "dedup")
+
+    # nothing is indexed from a transaction that rolls back
+    with db.engine.connect() as conn:
+        transaction = conn.begin()
+        db.load_trips(trips, connection=conn)
+        transaction.rollback()
+
+    assert len(db.read_trips()) == 0
+
+    # and everything once the transaction commits
+    with db.engine.connect() as conn:
+        transaction = conn.begin()
+        db.load_trips(trips, connection=conn)
+        assert db.last_load["staged"] == len(trips)
+        transaction.commit()
+
+    assert len(db.read_trips()) == len(trips)
+    db.load_trips(trips)
+    assert db.last_load["staged"] == 0
+
+
+def test_database_upserts_skip_dedup(tmp_path, database, records):
+    _, trips = records
+    db = database(dedup=tmp_path / "dedup")
+    db.load_trips(trips)
+    distance = db.read_trips()["trip_distance"].sum()
+
+    db.load_trips(trips, on_conflict_update=("(provider_id, trip_id)", ["trip_distance = excluded.trip_distance + 1"]))
+    assert db.last_load["staged"] == len(trips)
+    assert db.read_trips()["trip_distance"].sum() == distance + len(trips)
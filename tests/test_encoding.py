@@ -0,0 +1,39 @@
+import datetime
+import uuid
+
+import pytest
+
+import mds.encoding
+from mds.encoding import json_dumps
+
+
+VALUE = {
+    "name": "café",
+    "values": [1, 2.5, float("nan"), float("inf"), None],
+    "nested": {"missing": float("-inf"), "flags": (True, False)},
+    "time": datetime.datetime(2019, 1, 1, 12, 30, 15, 250000),
+    "utc": datetime.datetime(2019, 1, 1, 12, tzinfo=datetime.timezone.utc),
+    "date": datetime.date(2019, 1, 1),
+    "id": uuid.UUID("12345678-1234-5678-1234-567812345678"),
+}
+
+EXPECTED = (
+    '{"name":"café","values":[1,2.5,null,null,null],"nested":{"missing":null,"flags":[true,false]},'
+    '"time":"2019-01-01T12:30:15.250000","utc":"2019-01-01T12:00:00+00:00","date":"2019-01-01",'
+    '"id":"12345678-1234-5678-1234-567812345678"}'
+)
+
+
+def test_json_dumps_fallback(monkeypatch):
+    monkeypatch.setattr(mds.encoding, "orjson", None)
+    assert json_dumps(VALUE) == EXPECTED
+
+
+def test_json_dumps_orjson():
+    pytest.importorskip("orjson")
+    assert json_dumps(VALUE) == EXPECTED
+
+
+def test_json_dumps_non_str_keys():
+    # orjson rejects these, so the standard library serializes them
+    assert json_dumps({1: float("nan")}) == '{"1":null}'
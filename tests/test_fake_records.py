@@ -0,0 +1,36 @@
+import datetime
+
+from mds.encoding import JsonEncoder
+from mds.fake.records import StatusChange
+
+
+def test_status_change_captures_battery():
+    device = dict(provider_id="p", device_id="d", battery_pct=0.8)
+    event = StatusChange(device, "available", "service_start", 0, None)
+    device["battery_pct"] = 0.5
+
+    assert event["battery_pct"] == 0.8
+    assert event.to_dict()["battery_pct"] == 0.8
+    assert device["battery_pct"] == 0.5
+
+
+def test_device_trip_battery(generator):
+    device = generator.devices(1, "Provider")[0]
+    device["battery_pct"] = 0.9
+
+    (start, end), trip = generator.device_trip(device, event_time=datetime.datetime(2019, 1, 1, 12))
+
+    # the start event has the charge before the trip, the end event the charge after it
+    assert start["battery_pct"] == 0.9
+    assert end["battery_pct"] == device["battery_pct"] < 0.9
+    assert "battery_pct" not in trip
+    assert start["associated_trip"] == end["associated_trip"] == trip["trip_id"]
+
+
+def test_records_encode_as_dicts(generator):
+    device = generator.devices(1, "Provider")[0]
+    (start, _), trip = generator.device_trip(device, event_time=datetime.datetime(2019, 1, 1, 12))
+
+    encoder = JsonEncoder(version=generator.version)
+    assert encoder.default(start) == start.to_dict() == dict(start)
+    assert encoder.default(trip) == trip.to_dict() == dict(trip)
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from mds.files import PayloadWriter
+from mds.schemas import TRIPS
+
+
+def records(start, end):
+    return [dict(trip_id=str(i)) for i in range(start, end)]
+
+
+def read(paths):
+    return [json.loads(path.read_text()) for path in paths]
+
+
+def test_paging_and_links(tmp_path):
+    with PayloadWriter(TRIPS, "0.3.0", tmp_path, page_size=4, prefix="test") as writer:
+        writer.write(records(0, 3))
+        writer.write(records(3, 10))
+
+    assert [p.name for p in writer.paths] == ["test_000000.json", "test_000001.json", "test_000002.json"]
+
+    payloads = read(writer.paths)
+    assert [len(p["data"][TRIPS]) for p in payloads] == [4, 4, 2]
+    assert [p["links"]["next"] for p in payloads] == ["test_000001.json", "test_000002.json", None]
+    assert [t["trip_id"] for p in payloads for t in p["data"][TRIPS]] == [str(i) for i in range(10)]
+    assert all(p["version"] == "0.3.0" for p in payloads)
+
+
+def test_full_last_page(tmp_path):
+    writer = PayloadWriter(TRIPS, "0.3.0", tmp_path, page_size=5)
+    writer.write(records(0, 10))
+    paths = writer.close()
+
+    # a full page waits for more records, so the last page is never empty
+    payloads = read(paths)
+    assert [len(p["data"][TRIPS]) for p in payloads] == [5, 5]
+    assert payloads[-1]["links"]["next"] is None
+    assert paths[0].name == f"{TRIPS}_000000.json"
+
+
+def test_empty(tmp_path):
+    with PayloadWriter(TRIPS, "0.3.0", tmp_path) as writer:
+        pass
+
+    payloads = read(writer.paths)
+    assert len(payloads) == 1
+    assert payloads[0]["data"][TRIPS] == []
+    assert payloads[0]["links"]["next"] is None
+
+
+def test_closed(tmp_path):
+    writer = PayloadWriter(TRIPS, "0.3.0", tmp_path)
+    writer.close()
+
+    with pytest.raises(ValueError):
+        writer.write(records(0, 1))
+
+    with pytest.raises(ValueError):
+        PayloadWriter(TRIPS, "0.3.0", tmp_path, page_size=0)
@@ -0,0 +1,218 @@
+import json
+import uuid
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from mds.db import loaders, sql
+from mds.versions import Version
+
+
+def test_copy_value_arrays():
+    value = loaders.DataFrame._copy_value
+
+    assert value(["electric", "human"]) == '{"electric","human"}'
+    assert value(("electric",)) == '{"electric"}'
+    assert value([]) == "{}"
+
+    # NULL items are unquoted, quotes and backslashes in text are escaped
+    u = uuid.UUID("3a4c6954-0ad5-4273-a876-d6c94519b91f")
+    assert value([u, None]) == '{"3a4c6954-0ad5-4273-a876-d6c94519b91f",NULL}'
+    assert value(['a"b', "c\\d", "e,f"]) == '{"a\\"b","c\\\\d","e,f"}'
+
+
+def test_copy_value_others():
+    value = loaders.DataFrame._copy_value
+
+    assert json.loads(value({ "type": "Point", "coordinates": [1, 2] })) == { "type": "Point", "coordinates": [1, 2] }
+    assert value("text") == "text"
+    assert value(None) is None
+
+
+def test_copy_frame():
+    df = pd.DataFrame({
+        "propulsion_type": [["electric"], ["human", None]],
+        "trip_distance": [1.0, np.nan],
+        "battery_pct": [0.5, np.nan]
+    })
+    copied = loaders.DataFrame._copy_frame(df)
+
+    assert list(copied["propulsion_type"]) == ['{"electric"}', '{"human",NULL}']
+    assert str(copied["trip_distance"].dtype) == "Int64"
+    assert copied["battery_pct"].dtype == float
+
+    # the input isn't changed
+    assert df["propulsion_type"][0] == ["electric"]
+
+
+def test_add_counts():
+    assert loaders.add_counts() == dict(staged=0, inserted=0, updated=0, ignored=0)
+    assert loaders.add_counts(dict(staged=2, inserted=1, ignored=1), dict(staged=3, inserted=3)) == \
+        dict(staged=5, inserted=4, updated=0, ignored=1)
+
+
+def staged_batches(monkeypatch):
+    """
+    Record the number of rows in each batch staged by DataFrame.load().
+    """
+    batches = []
+    stage = loaders.DataFrame._stage
+
+    def _stage(cls, df, *args, **kwargs):
+        batches.append(len(df))
+        return stage(df, *args, **kwargs)
+
+    monkeypatch.setattr(loaders.DataFrame, "_stage", classmethod(_stage))
+    return batches
+
+
+def test_batches_across_payloads(monkeypatch, database, records):
+    _, trips = records
+    db = database()
+    batches = staged_batches(monkeypatch)
+
+    payloads = [dict(version="0.3.0", data=dict(trips=trips[i:i + 7])) for i in range(0, 21, 7)]
+    db.load_trips(payloads, batch_size=5)
+
+    assert batches == [5, 5, 5, 5, 1]
+    assert db.last_load["staged"] == db.last_load["inserted"] == 21
+    assert len(db.read_trips()) == 21
+
+
+def test_batches_per_payload(monkeypatch, database, records):
+    _, trips = records
+    db = database()
+    batches = staged_batches(monkeypatch)
+
+    payloads = [dict(version="0.3.0", data=dict(trips=trips[i:i + 7])) for i in range(0, 21, 7)]
+    db.load_trips(payloads)
+
+    assert batches == [7, 7, 7]
+    assert db.last_load["staged"] == 21
+
+
+def test_batches_rollback_together(monkeypatch, database, records):
+    _, trips = records
+    db = database()
+    batches = staged_batches(monkeypatch)
+
+    def _fail(df, version):
+        if len(batches) > 0:
+            raise RuntimeError("load failed")
+        return df
+
+    payloads = [dict(version="0.3.0", data=dict(trips=trips[:10]))]
+    with pytest.raises(RuntimeError):
+        db.load_trips(payloads, batch_size=5, before_load=_fail)
+
+    # the batches of a load share a transaction
+    assert batches == [5]
+    assert len(db.read_trips()) == 0
+
+
+def test_timestamps_todatetime():
+    to_datetime = loaders.DataFrame._timestamps_todatetime
+    expected = pd.Timestamp("2019-01-01 12:00", tz="UTC")
+
+    df = pd.DataFrame({ "event_time": [1546344000, None], "other": [1546344000, 1] })
+    df = to_datetime(df, ["event_time", "missing"], Version("0.2.0"))
+    assert df["event_time"][0] == expected
+    assert pd.isna(df["event_time"][1])
+    assert df["other"][0] == 1546344000
+
+    df = pd.DataFrame({ "event_time": [1546344000000, "1546344000000"] })
+    df = to_datetime(df, ["event_time"], Version("0.3.0"))
+    assert (df["event_time"] == expected).all()
+
+
+def test_timestamps_todatetime_parsed():
+    to_datetime = loaders.DataFrame._timestamps_todatetime
+    expected = pd.Timestamp("2019-01-01 12:00", tz="UTC")
+
+    # text and datetimes are parsed as-is, whatever the version
+    df = pd.DataFrame({ "a": ["2019-01-01T12:00:00Z", "2019-01-01T07:00:00-05:00"],
+                        "b": pd.to_datetime(["2019-01-01 12:00"] * 2) })
+    df = to_datetime(df, ["a", "b"], Version("0.3.0"))
+
+    assert (df["a"] == expected).all()
+    assert (df["b"] == expected).all()
+    assert str(df["a"].dtype) == str(df["b"].dtype) == "datetime64[ns, UTC]"
+
+
+def test_data_loader(tmp_path):
+    record = dict(provider_id="p", device_id="d")
+    payload = dict(version="0.3.0", data=dict(trips=[record]))
+    path = tmp_path / "trips.json"
+    path.write_text(json.dumps(payload))
+
+    assert loaders.data_loader(pd.DataFrame([record])) is loaders.DataFrame
+    assert loaders.data_loader(record) is loaders.Records
+    assert loaders.data_loader([record, record, record]) is loaders.Records
+    assert loaders.data_loader(payload) is loaders.Payloads
+    assert loaders.data_loader([payload]) is loaders.Payloads
+    assert loaders.data_loader(str(path)) is loaders.File
+    assert loaders.data_loader([path]) is loaders.File
+
+    assert loaders.data_loader([]) is None
+    assert loaders.data_loader(42) is None
+
+
+def test_data_loader_cache():
+    record = dict(provider_id="p", device_id="d")
+    payload = dict(version="0.3.0", data=dict(trips=[record]))
+
+    # the loader for a type is cached, and checked before the others
+    assert loaders.data_loader([record]) is loaders.Records
+    assert loaders._dispatch[list] is loaders.Records
+
+    # until it can't load a source of that type
+    assert loaders.data_loader([payload]) is loaders.Payloads
+    assert loaders._dispatch[list] is loaders.Payloads
+
+
+def test_data_loaders_refresh():
+    before = loaders.data_loaders()
+    assert before[-1] is loaders.DataFrame
+    assert loaders.data_loaders() is before
+
+    class _Sentinel():
+        pass
+
+    class SentinelLoader(loaders.Records):
+        @classmethod
+        def can_load(cls, source):
+            return isinstance(source, _Sentinel)
+
+    # defining a loader refreshes the cached loaders, most specific first
+    after = loaders.data_loaders()
+    assert after is not before
+    assert after.index(SentinelLoader) < after.index(loaders.Records)
+    assert loaders.data_loader(_Sentinel()) is SentinelLoader
+    assert loaders.data_loader(dict(provider_id="p", device_id="d")) is loaders.Records
+
+
+class FakeConnection():
+    def __init__(self):
+        self.info = {}
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+
+def test_execute_prepared():
+    conn = FakeConnection()
+    name, prepare = sql.prepare("SELECT 1")
+
+    # prepared once per connection, then executed by name
+    loaders.DataFrame._execute(conn, "SELECT 1")
+    loaders.DataFrame._execute(conn, "SELECT 1")
+    assert conn.statements == [prepare, f"EXECUTE {name}", f"EXECUTE {name}"]
+
+    loaders.DataFrame._execute(FakeConnection(), "SELECT 1")
+    assert conn.info[loaders.PREPARED_INFO] == { name }
+
+    conn = FakeConnection()
+    loaders.DataFrame._execute(conn, "SELECT 1", prepared=False)
+    assert conn.statements == ["SELECT 1"]
@@ -0,0 +1,55 @@
+import threading
+import time
+
+from mds.pipeline import sync
+from mds.schemas import STATUS_CHANGES
+
+
+class FakeClient():
+    version = "0.3.0"
+
+    def __init__(self, pages):
+        self.pages = pages
+        self.exhausted = threading.Event()
+
+    def stream(self, record_type, provider=None, **kwargs):
+        yield from self.pages
+        self.exhausted.set()
+
+
+class FailingDatabase():
+    last_load = None
+
+    def __init__(self, client):
+        self.client = client
+
+    def load_status_changes(self, source, **kwargs):
+        # fail once the fetcher is waiting for room to put _DONE on the full queue
+        self.client.exhausted.wait(timeout=5)
+        time.sleep(0.2)
+        raise RuntimeError("load failed")
+
+    load_trips = load_status_changes
+
+
+def page():
+    return dict(version="0.3.0", data={ STATUS_CHANGES: [{}] })
+
+
+def test_sync_failing_load_does_not_hang():
+    client = FakeClient([page(), page(), page()])
+    errors = []
+
+    def run():
+        try:
+            sync(client, FailingDatabase(client), STATUS_CHANGES, batch_size=1, queue_size=2)
+        except Exception as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+
+    assert not thread.is_alive()
+    assert len(errors) == 1
+    assert isinstance(errors[0], RuntimeError)
@@ -0,0 +1,33 @@
+import datetime
+
+import pytest
+
+from mds.db import schema
+
+
+def test_create_partitions():
+    statements = schema.create_partitions("trips", datetime.date(2019, 1, 15), datetime.date(2019, 3, 1))
+
+    assert len(statements) == 4
+    assert "\"trips_201901\" PARTITION OF \"trips\" FOR VALUES FROM ('2019-01-01') TO ('2019-02-01')" in statements[0]
+    assert "\"trips_201903\"" in statements[2]
+    assert statements[-1].endswith('"trips_default" PARTITION OF "trips" DEFAULT')
+
+
+def test_create_partitions_days():
+    statements = schema.create_partitions("trips", datetime.datetime(2019, 12, 31, 12), datetime.date(2020, 1, 1),
+                                          "day", default=False)
+
+    assert len(statements) == 2
+    assert "FROM ('2019-12-31') TO ('2020-01-01')" in statements[0]
+    assert "FROM ('2020-01-01') TO ('2020-01-02')" in statements[1]
+
+
+def test_create_partitions_default_only():
+    statements = schema.create_partitions("trips", None, None, "month")
+    assert statements == ['CREATE TABLE IF NOT EXISTS "trips_default" PARTITION OF "trips" DEFAULT']
+
+
+def test_create_partitions_invalid():
+    with pytest.raises(ValueError):
+        schema.create_partitions("trips", None, None, "week")
@@ -0,0 +1,89 @@
+import datetime
+
+import pytest
+import requests
+
+from mds.fake.server import MEDIA_TYPE, TOKEN_PATHS, ProviderServer
+from mds.schemas import STATUS_CHANGES, TRIPS
+
+
+NOON = int(datetime.datetime(2019, 1, 1, 12, tzinfo=datetime.timezone.utc).timestamp() * 1000)
+
+
+@pytest.fixture(scope="module")
+def server(records):
+    status_changes, trips = records
+
+    with ProviderServer(status_changes=status_changes, trips=trips, version="0.3.0", page_size=10,
+                        token="secret") as server:
+        server.counts = { STATUS_CHANGES: len(status_changes), TRIPS: len(trips) }
+        yield server
+
+
+def get(server, record_type, token="secret", **params):
+    return requests.get(f"{server.url}/{record_type}", params=params,
+                        headers={ "Authorization": f"Bearer {token}" })
+
+
+def pages(server, record_type, **params):
+    records, url = [], f"{server.url}/{record_type}"
+    while url:
+        r = requests.get(url, params=params, headers={ "Authorization": "Bearer secret" })
+        assert r.status_code == 200
+        params = None
+        records.extend(r.json()["data"][record_type])
+        url = r.json()["links"]["next"]
+    return records
+
+
+def test_auth(server):
+    assert get(server, TRIPS, token="wrong").status_code == 401
+    assert requests.get(f"{server.url}/{TRIPS}").status_code == 401
+
+    r = get(server, TRIPS)
+    assert r.status_code == 200
+    assert r.headers["Content-Type"] == f"{MEDIA_TYPE};version=0.3"
+    assert len(r.json()["data"][TRIPS]) == 10
+
+
+def test_token_endpoints(server):
+    r = requests.post(server.url + TOKEN_PATHS["oauth"],
+                      data=dict(grant_type="client_credentials", client_id="fake", client_secret="fake"))
+    assert r.status_code == 200 and r.json()["access_token"] == "secret"
+
+    r = requests.post(server.url + TOKEN_PATHS["oauth"],
+                      data=dict(grant_type="client_credentials", client_id="fake", client_secret="wrong"))
+    assert r.status_code == 401
+
+    r = requests.post(server.url + TOKEN_PATHS["bolt"], params=dict(email="fake", password="fake"))
+    assert r.status_code == 200 and r.json()["token"] == "secret"
+
+    r = requests.post(server.url + TOKEN_PATHS["spin"], data=dict(email="fake", password="wrong"))
+    assert r.status_code == 401
+
+
+def test_unsupported_version(server):
+    r = requests.get(f"{server.url}/{TRIPS}",
+                     headers={ "Authorization": "Bearer secret", "Accept": f"{MEDIA_TYPE};version=0.2" })
+    assert r.status_code == 406
+
+
+def test_paging(server):
+    assert len(pages(server, STATUS_CHANGES)) == server.counts[STATUS_CHANGES]
+    assert len(pages(server, TRIPS)) == server.counts[TRIPS]
+
+
+def test_time_filters(server):
+    before = pages(server, STATUS_CHANGES, end_time=NOON)
+    after = pages(server, STATUS_CHANGES, start_time=NOON)
+    assert len(before) + len(after) == server.counts[STATUS_CHANGES]
+    assert all(int(s["event_time"]) < NOON for s in before)
+    assert all(int(s["event_time"]) >= NOON for s in after)
+
+    before = pages(server, TRIPS, max_end_time=NOON)
+    after = pages(server, TRIPS, min_end_time=NOON)
+    assert len(before) + len(after) == server.counts[TRIPS]
+    assert all(int(t["end_time"]) < NOON for t in before)
+    assert all(int(t["end_time"]) >= NOON for t in after)
+
+    assert get(server, TRIPS, min_end_time="noon").status_code == 400
@@ -0,0 +1,92 @@
+import pytest
+
+from mds.db import sql
+from mds.schemas import STATUS_CHANGES, TRIPS
+from mds.versions import UnsupportedVersionError
+
+
+def test_staging_columns_status_changes():
+    columns = dict(sql.staging_columns(STATUS_CHANGES, "0.3.0"))
+
+    assert columns["event_time"] == "timestamptz"
+    assert columns["publication_time"] == "timestamptz"
+    assert "associated_trip" in columns and "associated_trips" not in columns
+
+    columns = dict(sql.staging_columns(STATUS_CHANGES, "0.2.0"))
+    assert "associated_trips" in columns and "publication_time" not in columns
+
+
+def test_staging_columns_trips():
+    columns = dict(sql.staging_columns(TRIPS, "0.3.0"))
+    assert columns["start_time"] == columns["end_time"] == "timestamptz"
+    assert "start_location" not in columns
+
+    columns = dict(sql.staging_columns(TRIPS, "0.3.0", geometry=True))
+    assert "start_location" in columns and "end_location" in columns
+
+
+def test_staging_columns_dialects():
+    assert dict(sql.staging_columns(TRIPS, "0.3.0", dialect="sqlite"))["trip_distance"] == "real"
+    assert dict(sql.staging_columns(TRIPS, "0.3.0", dialect="duckdb"))["start_time"] == "timestamp"
+
+    # a new list each time, so callers can't change the memoized columns
+    columns = sql.staging_columns(TRIPS, "0.3.0")
+    columns.clear()
+    assert len(sql.staging_columns(TRIPS, "0.3.0")) > 0
+
+
+def test_staging_columns_invalid():
+    with pytest.raises(ValueError):
+        sql.staging_columns("vehicles", "0.3.0")
+
+    with pytest.raises(UnsupportedVersionError):
+        sql.staging_columns(TRIPS, "0.1.0")
+
+    with pytest.raises(ValueError):
+        sql.staging_columns(TRIPS, "0.3.0", dialect="mysql")
+
+
+@pytest.mark.parametrize("dialect,schema", [("postgresql", "pg_temp"), ("sqlite", "temp"), ("duckdb", "temp")])
+def test_temp_tables(dialect, schema):
+    create = sql.create_temp_table("trips_staging", [("trip_id", "text"), ("end_time", "timestamptz")], dialect)
+    assert create.startswith(f'CREATE TEMP TABLE {schema}."trips_staging" ("trip_id" text,"end_time" timestamptz)')
+    assert ("ON COMMIT PRESERVE ROWS" in create) == (dialect != "sqlite")
+
+    assert sql.drop_temp_table("trips_staging", dialect) == f'DROP TABLE IF EXISTS {schema}."trips_staging"'
+
+
+def test_truncate_table():
+    assert sql.truncate_table("trips_staging") == 'TRUNCATE "trips_staging"'
+    assert sql.truncate_table("trips_staging", "sqlite") == 'DELETE FROM "trips_staging"'
+
+
+def test_merge_counts():
+    insert = sql.insert_trips_from("trips_staging", TRIPS, version="0.3.0")
+    merge = sql.merge_counts(insert)
+
+    assert insert.strip().rstrip(";").strip() in merge
+    assert "RETURNING (xmax = 0) AS inserted" in merge
+    assert "count(*) FILTER (WHERE NOT inserted) AS updated" in merge
+    # the wrapped INSERT can't end the statement early
+    assert merge.count(";") == 1
+
+
+def test_prepare():
+    name, prepare = sql.prepare("SELECT 1;")
+
+    assert name.startswith("mds_") and name.isidentifier()
+    assert prepare == f"PREPARE {name} AS SELECT 1"
+    assert sql.execute_prepared(name) == f"EXECUTE {name}"
+
+    # the name is derived from the statement's text, ignoring surrounding whitespace and ;
+    assert sql.prepare("\n  SELECT 1  ;\n")[0] == name
+    assert sql.prepare("SELECT 2")[0] != name
+
+
+def test_insert_statements_memoized():
+    insert = sql.insert_trips_from("trips_staging", TRIPS, version="0.3.0")
+
+    assert sql.insert_trips_from("trips_staging", TRIPS, version="0.3.0") is insert
+    assert sql.insert_trips_from("trips_staging", TRIPS, version="0.3.0", dialect="sqlite") != insert
+    assert sql.insert_trips_from("trips_staging", TRIPS, version="0.3.0",
+                                 on_conflict_update=("(provider_id, trip_id)", ["trip_distance = 0"])) != insert